@@ -0,0 +1,69 @@
+"""
+Benchmark CSV link extraction on a saved dataset page.
+
+Compares a full "html.parser" parse of the page, the SoupStrainer parse used by
+utils.datasets.parse_csv_links, and a page cache hit in extract_csv_links.
+
+Run from the datasets directory:
+
+    uv run python -m benchmarks.extract_links
+"""
+
+import logging
+import sys
+import tempfile
+import timeit
+
+from pathlib import Path
+
+from bs4 import BeautifulSoup
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from benchmarks.fixtures import PORTAL, dataset_page
+from utils.datasets import Manifest, extract_csv_links, parse_csv_links
+
+
+PAGE_URL = f"{PORTAL}/dataset/valorizacion"
+
+
+def full_parse(html: str) -> int:
+    """Parse the whole page, as extract_csv_links did before the strainer."""
+    soup = BeautifulSoup(html, "html.parser")
+    resources = soup.find("div", id="data-and-resources")
+    return len(resources.find_all("li")) if resources else 0
+
+
+def main(number: int = 50) -> None:
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    html = dataset_page(n_resources=12)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        manifest = Manifest(Path(tmp))
+        links = parse_csv_links(html, PAGE_URL)
+        manifest.record_page(PAGE_URL, {"links": links})
+
+        # Silence per-call log lines while timing.
+        logging.disable(logging.INFO)
+        timings = {
+            "full parse": timeit.timeit(lambda: full_parse(html), number=number),
+            "strainer parse": timeit.timeit(
+                lambda: parse_csv_links(html, PAGE_URL), number=number
+            ),
+            "page cache hit": timeit.timeit(
+                lambda: extract_csv_links(PAGE_URL, manifest=manifest),
+                number=number,
+            ),
+        }
+        logging.disable(logging.NOTSET)
+
+    logging.info(f"Page size: {len(html) / 1024:.0f} KB, {len(links)} CSV links")
+    baseline = timings["full parse"]
+    for name, total in timings.items():
+        per_call = total / number * 1000
+        logging.info(f"{name:>15}: {per_call:8.3f} ms/call ({baseline / total:7.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,89 @@
+"""
+Synthetic fixtures shaped like the files the notebooks download.
+
+Dataset pages follow the markup of datosabiertos.gob.pe (DKAN) dataset pages,
+including the navigation, description and metadata around the resources list,
+so parsing them costs about as much as parsing a real page. CSVs follow the
+layout and encoding of the SINIA downloads.
+"""
+
+import random
+
+
+PORTAL = "https://datosabiertos.gob.pe"
+
+
+def dataset_page(
+    n_resources: int = 6, base_url: str = PORTAL, name: str = "recurso"
+) -> str:
+    """Return the HTML of a dataset page listing n_resources CSV files."""
+    head = "".join(
+        f'<link rel="stylesheet" href="/sites/all/themes/css/style{i}.css">'
+        f'<script src="/sites/all/modules/js/module{i}.js"></script>'
+        for i in range(40)
+    )
+    nav = "".join(
+        f'<li class="leaf"><a href="/group/{i}" title="Grupo {i}">Grupo {i}</a></li>'
+        for i in range(120)
+    )
+    description = "".join(
+        f"<p>Párrafo {i} de la descripción del conjunto de datos sobre residuos "
+        "sólidos municipales, con información a nivel distrital.</p>"
+        for i in range(30)
+    )
+    resources = "".join(
+        '<li class="resource-item">'
+        f'<a class="heading" href="/node/{i}" title="Recurso {i}">'
+        f'Dataset de residuos {i}<span class="format-label" '
+        'property="dc:format" data-format="csv" data-original-title="csv">csv</span>'
+        "</a>"
+        '<div class="btn-group">'
+        f'<a class="btn btn-primary data-link" href="{base_url}/sites/default/files/'
+        f'{name}_{i}.csv">Descargar</a>'
+        "</div></li>"
+        for i in range(n_resources)
+    )
+    metadata = "".join(
+        f"<tr><th>Campo {i}</th><td>Valor {i}</td></tr>" for i in range(40)
+    )
+    footer = "".join(f'<a href="/page/{i}">Enlace {i}</a>' for i in range(80))
+    return (
+        f"<!DOCTYPE html><html><head><title>Dataset</title>{head}</head><body>"
+        f'<nav><ul class="menu">{nav}</ul></nav>'
+        f'<div class="content"><div class="description">{description}</div>'
+        '<div id="data-and-resources"><h2>Datos y Recursos</h2>'
+        f'<ul class="resource-list">{resources}</ul></div>'
+        f'<table class="metadata">{metadata}</table></div>'
+        f"<footer>{footer}</footer></body></html>"
+    )
+
+
+GENERATION_COLUMNS = [
+    "ANIO",
+    "UBIGEO",
+    "DEPARTAMENTO",
+    "PROVINCIA",
+    "DISTRITO",
+    "GENERACION_MUN_TANIO",
+    "POB_TOTAL_INEI",
+]
+
+
+def generation_csv(n_rows: int = 20_000, seed: int = 0) -> bytes:
+    """
+    Return a latin1, ";"-separated CSV shaped like the yearly generation dataset.
+
+    Rows cycle through 1,874 districts and the years 2014-2023, with
+    reproducible pseudo-random tonnage and population values.
+    """
+    rng = random.Random(seed)
+    lines = [";".join(GENERATION_COLUMNS)]
+    for i in range(n_rows):
+        district = i % 1874
+        dep, prov = district // 75, district // 10
+        lines.append(
+            f"{2014 + (i // 1874) % 10};{dep + 1:02d}{prov % 100:02d}{district % 100:02d};"
+            f"DEPARTAMENTO {dep};PROVINCIA {prov};DISTRITO {district} ÑAÑA;"
+            f"{rng.uniform(10, 5000):.2f};{rng.randint(500, 400_000)}"
+        )
+    return ("\n".join(lines) + "\n").encode("latin1")
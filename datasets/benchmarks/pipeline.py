@@ -0,0 +1,267 @@
+"""
+Benchmark the datasets pipeline end to end against a local stand-in server.
+
+Times each stage of what the notebooks do, with cold and warm caches:
+
+- download: download() of every dataset page and CSV into an empty directory
+  (cold), again with everything cached (warm), and with revalidation against
+  the server (conditional requests answered with 304).
+- links: extract_csv_links() fetching and parsing a page, and from the page
+  cache.
+- parse: read_dataset() of one CSV, and ingest() of all of them into Parquet
+  (cold, forced) and from the manifest (warm).
+- aggregate: a lazy group_by over the Parquet files, and rollup() built
+  (cold) and read from its cache (warm).
+- geo: the district layer read straight from GeoJSON, through read_layer()
+  with an empty cache (cold) and from its GeoParquet copy (warm), and
+  DistrictIndex lookups of random points.
+
+Pages and CSVs come from benchmarks.server, with configurable latency and
+injected 503s; archive.org fallbacks are answered by the same server, so no
+request leaves the machine. Each stage is run --repeat times and the results
+are written as JSON, by default to benchmarks/results/pipeline-<time>.json.
+
+Run from the datasets directory:
+
+    uv run python -m benchmarks.pipeline [--latency 0.05] [--failure-rate 0.1]
+"""
+
+import argparse
+import json
+import logging
+import platform
+import shutil
+import statistics
+import sys
+import tempfile
+import time
+
+from collections.abc import Callable
+from datetime import datetime
+from pathlib import Path
+
+import geopandas as gpd
+import numpy as np
+import polars as pl
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from benchmarks.server import ArchiveAdapter, StandInServer
+from utils.datasets import (
+    Manifest,
+    create_session,
+    download,
+    extract_csv_links,
+    ingest,
+    read_dataset,
+    rollup,
+)
+from utils.geo import DistrictIndex, read_layer
+
+
+BENCHMARKS_DIR = Path(__file__).resolve().parent
+DEFAULT_LAYER = (
+    BENCHMARKS_DIR.parent / "src" / "public" / "geojson" / "distrital.geojson"
+)
+ROLLUP_LEVELS = ["ANIO", "DEPARTAMENTO", "PROVINCIA", "DISTRITO"]
+ROLLUP_MEASURES = ["GENERACION_MUN_TANIO", "POB_TOTAL_INEI"]
+# Bounding box of Peru, for random lookup points.
+PERU_BOUNDS = (-81.4, -18.4, -68.6, 0.0)
+LOOKUP_POINTS = 10_000
+
+
+def measure(
+    fn: Callable[[], object],
+    repeat: int,
+    setup: Callable[[], object] = lambda: None,
+) -> dict:
+    """Run setup() then time fn() repeat times; return the timings in seconds."""
+    seconds = []
+    for _ in range(repeat):
+        setup()
+        start = time.perf_counter()
+        fn()
+        seconds.append(time.perf_counter() - start)
+    return {
+        "seconds": seconds,
+        "min": min(seconds),
+        "median": statistics.median(seconds),
+    }
+
+
+def bench_network(
+    server: StandInServer, work_dir: Path, repeat: int, workers: int
+) -> tuple[dict[str, dict], list[Path]]:
+    """Time downloads and link extraction; return the results and the CSVs."""
+    session = create_session()
+    session.mount("https://web.archive.org", ArchiveAdapter(server.url))
+    data_dir = work_dir / "data"
+    results = {}
+
+    def fresh_dir() -> None:
+        shutil.rmtree(data_dir, ignore_errors=True)
+
+    def fetch(**kwargs) -> None:
+        download(
+            server.page_urls, data_dir, max_workers=workers, session=session, **kwargs
+        )
+
+    def network_stage(name: str, fn: Callable[[], object], **kwargs) -> None:
+        server.reset_counters()
+        results[name] = measure(fn, repeat, **kwargs)
+        results[name]["requests"] = server.requests
+        results[name]["failures"] = server.failures
+
+    network_stage("download.cold", fetch, setup=fresh_dir)
+    network_stage("download.warm", fetch)
+    network_stage("download.revalidate", lambda: fetch(revalidate=True, page_max_age=0))
+    files = sorted(data_dir.glob("*.csv"))
+    results["download.cold"]["bytes"] = sum(f.stat().st_size for f in files)
+    results["download.cold"]["files"] = len(files)
+
+    page_url = server.page_urls[0]
+    manifest = Manifest(work_dir / "links")
+    network_stage("links.cold", lambda: extract_csv_links(page_url, session=session))
+    extract_csv_links(page_url, session=session, manifest=manifest)
+    network_stage(
+        "links.warm",
+        lambda: extract_csv_links(page_url, session=session, manifest=manifest),
+    )
+    return results, files
+
+
+def bench_tables(files: list[Path], data_dir: Path, repeat: int) -> dict[str, dict]:
+    """Time parsing, conversion and aggregation of the downloaded CSVs."""
+    results = {
+        "parse.read_dataset": measure(lambda: read_dataset(files[0]), repeat),
+        "parse.ingest.cold": measure(
+            lambda: ingest(files, data_dir, force=True), repeat
+        ),
+        "parse.ingest.warm": measure(lambda: ingest(files, data_dir), repeat),
+    }
+    results["parse.read_dataset"]["rows"] = read_dataset(files[0]).height
+
+    parquet_files = ingest(files, data_dir)
+
+    def group_by() -> pl.DataFrame:
+        return (
+            pl.scan_parquet(parquet_files)
+            .group_by("ANIO", "DEPARTAMENTO")
+            .agg(pl.col(ROLLUP_MEASURES).sum())
+            .collect()
+        )
+
+    def build_rollups(force: bool) -> None:
+        for path in files:
+            rollup(path, data_dir, ROLLUP_LEVELS, ROLLUP_MEASURES, force=force)
+
+    results["aggregate.group_by"] = measure(group_by, repeat)
+    results["aggregate.rollup.cold"] = measure(lambda: build_rollups(True), repeat)
+    results["aggregate.rollup.warm"] = measure(lambda: build_rollups(False), repeat)
+    return results
+
+
+def bench_geo(layer: Path, work_dir: Path, repeat: int) -> dict[str, dict]:
+    """Time reading the district layer with and without its GeoParquet cache."""
+    layer_copy = work_dir / "geo" / layer.name
+    layer_copy.parent.mkdir(parents=True, exist_ok=True)
+    shutil.copy2(layer, layer_copy)
+    cache_dir = layer_copy.parent / "cache"
+
+    results = {
+        "geo.read_geojson": measure(lambda: gpd.read_file(layer_copy), repeat),
+        "geo.read_layer.cold": measure(
+            lambda: read_layer(layer_copy),
+            repeat,
+            setup=lambda: shutil.rmtree(cache_dir, ignore_errors=True),
+        ),
+        "geo.read_layer.warm": measure(lambda: read_layer(layer_copy), repeat),
+        "geo.read_layer.columns": measure(
+            lambda: read_layer(layer_copy, columns=["IDDIST"]), repeat
+        ),
+    }
+
+    index = DistrictIndex.from_layer(layer_copy)
+    rng = np.random.default_rng(0)
+    lon = rng.uniform(PERU_BOUNDS[0], PERU_BOUNDS[2], LOOKUP_POINTS)
+    lat = rng.uniform(PERU_BOUNDS[1], PERU_BOUNDS[3], LOOKUP_POINTS)
+    results["geo.district_lookup"] = measure(lambda: index.lookup(lon, lat), repeat)
+    results["geo.district_lookup"]["points"] = LOOKUP_POINTS
+    return results
+
+
+def log_results(stages: dict[str, dict]) -> None:
+    lines = [f"{'stage':<26}{'min':>10}{'median':>10}"]
+    for name, result in stages.items():
+        lines.append(
+            f"{name:<26}{result['min'] * 1000:>8.1f}ms{result['median'] * 1000:>8.1f}ms"
+        )
+    logging.info("\n".join(lines))
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--pages", type=int, default=4, help="dataset pages")
+    parser.add_argument("--files", type=int, default=3, help="CSVs per page")
+    parser.add_argument("--rows", type=int, default=20_000, help="rows per CSV")
+    parser.add_argument(
+        "--latency", type=float, default=0.02, help="seconds added to each request"
+    )
+    parser.add_argument(
+        "--failure-rate",
+        type=float,
+        default=0.0,
+        help="share of requests answered with a 503",
+    )
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("-j", "--workers", type=int, default=4)
+    parser.add_argument("-r", "--repeat", type=int, default=3)
+    parser.add_argument("--layer", type=Path, default=DEFAULT_LAYER)
+    parser.add_argument("-o", "--output", type=Path, help="JSON file to write")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    started = datetime.now()
+    server = StandInServer(
+        args.pages, args.files, args.rows, args.latency, args.failure_rate, args.seed
+    )
+
+    with tempfile.TemporaryDirectory() as tmp, server:
+        work_dir = Path(tmp)
+        # Silence per-file log lines (and the expected fallback warnings).
+        logging.disable(logging.WARNING)
+        try:
+            stages, files = bench_network(server, work_dir, args.repeat, args.workers)
+            stages |= bench_tables(files, work_dir / "data", args.repeat)
+            if args.layer.is_file():
+                stages |= bench_geo(args.layer, work_dir, args.repeat)
+        finally:
+            logging.disable(logging.NOTSET)
+        if not args.layer.is_file():
+            logging.warning(f"Layer not found, skipping geo stages: {args.layer}")
+
+    log_results(stages)
+    results = {
+        "started": started.isoformat(timespec="seconds"),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "polars": pl.__version__,
+        "geopandas": gpd.__version__,
+        "config": {
+            key: str(value) if isinstance(value, Path) else value
+            for key, value in vars(args).items()
+            if key != "output"
+        },
+        "stages": stages,
+    }
+    output = args.output or (
+        BENCHMARKS_DIR / "results" / f"pipeline-{started:%Y%m%d-%H%M%S}.json"
+    )
+    output.parent.mkdir(parents=True, exist_ok=True)
+    output.write_text(json.dumps(results, indent=2))
+    logging.info(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
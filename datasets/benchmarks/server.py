@@ -0,0 +1,208 @@
+"""
+A local stand-in for datosabiertos.gob.pe and archive.org.
+
+StandInServer serves n_pages dataset pages ("/dataset/<page>") built with
+fixtures.dataset_page, each linking to n_files generation CSVs
+("/<page>/sites/default/files/generacion_anual_<page>_<i>.csv"). Responses
+carry an ETag and Last-Modified, answer conditional requests with "304 Not
+Modified" and honour single Range requests, like the real portal.
+
+Every primary request waits "latency" seconds and fails with a "503 Service
+Unavailable" with probability "failure_rate" (seeded, so runs are
+reproducible). Archive copies are served under "/archive/web/0/<url>" without
+failures; mount ArchiveAdapter on a session to send its archive.org requests
+there instead of to the internet.
+"""
+
+import hashlib
+import random
+import threading
+import time
+
+from email.utils import formatdate
+from functools import lru_cache
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Optional
+
+import requests
+
+from requests.adapters import HTTPAdapter
+
+from benchmarks.fixtures import dataset_page, generation_csv
+
+
+ARCHIVE_PREFIX = "/archive/web/0/"
+LAST_MODIFIED = formatdate(0, usegmt=True)
+
+
+class StandInServer:
+    """
+    Serve fixture pages and CSVs on localhost from a background thread.
+
+    Use as a context manager; "url" is the base URL once started, and "page_urls"
+    lists the dataset pages. "requests" and "failures" count the primary
+    requests received and the ones answered with an injected 503.
+    """
+
+    def __init__(
+        self,
+        n_pages: int = 4,
+        n_files: int = 3,
+        rows: int = 20_000,
+        latency: float = 0.0,
+        failure_rate: float = 0.0,
+        seed: int = 0,
+    ) -> None:
+        self.n_pages = n_pages
+        self.n_files = n_files
+        self.rows = rows
+        self.latency = latency
+        self.failure_rate = failure_rate
+        self.requests = 0
+        self.failures = 0
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        assert self._httpd is not None, "server is not running"
+        host, port = self._httpd.server_address[:2]
+        return f"http://{host}:{port}"
+
+    @property
+    def page_urls(self) -> list[str]:
+        return [f"{self.url}/dataset/{page}" for page in range(self.n_pages)]
+
+    def __enter__(self) -> "StandInServer":
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", 0), _handler(self))
+        self._httpd.daemon_threads = True
+        threading.Thread(target=self._httpd.serve_forever, daemon=True).start()
+        # Generate every CSV up front so the first download is not slower.
+        for page in range(self.n_pages):
+            for i in range(self.n_files):
+                self.body(
+                    f"/{page}/sites/default/files/generacion_anual_{page}_{i}.csv"
+                )
+        return self
+
+    def __exit__(self, *exc_info) -> None:
+        assert self._httpd is not None
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        self._httpd = None
+
+    def reset_counters(self) -> None:
+        with self._lock:
+            self.requests = self.failures = 0
+
+    def should_fail(self) -> bool:
+        """Count a primary request and decide whether to inject a failure."""
+        with self._lock:
+            self.requests += 1
+            failed = self._rng.random() < self.failure_rate
+            self.failures += failed
+            return failed
+
+    def body(self, path: str) -> Optional[tuple[bytes, str]]:
+        """Return the content and type served at a path, or None."""
+        parts = path.strip("/").split("/")
+        if len(parts) == 2 and parts[0] == "dataset" and parts[1].isdigit():
+            page = int(parts[1])
+            html = dataset_page(
+                self.n_files,
+                base_url=f"{self.url}/{page}",
+                name=f"generacion_anual_{page}",
+            )
+            return html.encode(), "text/html; charset=utf-8"
+        if path.endswith(".csv"):
+            return _csv(self.rows, path), "text/csv"
+        return None
+
+
+@lru_cache
+def _csv(rows: int, path: str) -> bytes:
+    return generation_csv(rows, seed=int(hashlib.sha256(path.encode()).hexdigest(), 16))
+
+
+def _handler(server: StandInServer) -> type[BaseHTTPRequestHandler]:
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def do_GET(self) -> None:
+            path = self.path
+            if path.startswith(ARCHIVE_PREFIX):
+                # The archived URL is absolute; serve the same content locally.
+                original = path[len(ARCHIVE_PREFIX) :]
+                path = "/" + original.split("://", 1)[-1].split("/", 1)[-1]
+            else:
+                time.sleep(server.latency)
+                if server.should_fail():
+                    self.send_error(HTTPStatus.SERVICE_UNAVAILABLE)
+                    return
+
+            found = server.body(path)
+            if found is None:
+                self.send_error(HTTPStatus.NOT_FOUND)
+                return
+            body, content_type = found
+            etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+
+            if self.headers.get("If-None-Match") == etag:
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_header("ETag", etag)
+                self.send_header("Content-Length", "0")
+                self.end_headers()
+                return
+
+            status, start, end = HTTPStatus.OK, 0, len(body)
+            range_header = self.headers.get("Range", "")
+            if_range = self.headers.get("If-Range")
+            if range_header.startswith("bytes=") and if_range in (None, etag):
+                first, _, last = range_header[len("bytes=") :].partition("-")
+                start = int(first or 0)
+                end = int(last) + 1 if last else len(body)
+                if start >= len(body):
+                    self.send_error(HTTPStatus.REQUESTED_RANGE_NOT_SATISFIABLE)
+                    return
+                status = HTTPStatus.PARTIAL_CONTENT
+
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(end - start))
+            self.send_header("ETag", etag)
+            self.send_header("Last-Modified", LAST_MODIFIED)
+            self.send_header("Accept-Ranges", "bytes")
+            if status == HTTPStatus.PARTIAL_CONTENT:
+                self.send_header(
+                    "Content-Range", f"bytes {start}-{end - 1}/{len(body)}"
+                )
+            self.end_headers()
+            self.wfile.write(body[start:end])
+
+        def log_message(self, format: str, *args) -> None:
+            pass
+
+    return Handler
+
+
+class ArchiveAdapter(HTTPAdapter):
+    """
+    Send archive.org requests to a StandInServer's archive copies.
+
+    Mount on "https://web.archive.org" of the session passed to download().
+    Responses keep the archive.org URL, so they are reported as archive hits.
+    """
+
+    def __init__(self, server_url: str, **kwargs) -> None:
+        super().__init__(**kwargs)
+        self.server_url = server_url
+
+    def send(self, request: requests.PreparedRequest, **kwargs) -> requests.Response:
+        original = request.url or ""
+        path = original.split("://web.archive.org", 1)[-1]
+        request.url = f"{self.server_url}/archive{path}"
+        response = super().send(request, **kwargs)
+        response.url = original
+        return response
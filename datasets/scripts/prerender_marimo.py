@@ -1,33 +1,289 @@
-import os
-import subprocess
+"""
+Pre-render exported marimo notebooks to static HTML.
+
+Usage: python prerender_marimo.py [-o OUTPUT_DIR] [-j JOBS] [-t TIMEOUT]
+                                  [--report REPORT] [--cache CACHE] [--force]
+                                  INPUT [INPUT ...]
+
+Each INPUT is an HTML file exported with "marimo export html", or a glob pattern
+matching several. All notebooks are rendered in one headless Chromium, with up
+to JOBS pages open at once, and written to OUTPUT_DIR under the same file name.
+
+A page is saved once the kernel has connected and no cell has been queued or
+running for a few consecutive checks; a notebook that does not get there within
+TIMEOUT seconds fails. The time spent loading the page, starting the kernel,
+running the cells and serializing the result is logged for every notebook and,
+with --report, written to a JSON file.
+
+A notebook is skipped when its exported HTML has the same SHA-256 as on the last
+successful render and the output file is still there. The hashes are kept in
+CACHE (build/prerender-cache.json by default), outside OUTPUT_DIR so they are
+not published with the pages.
+
+Chromium must be installed once beforehand with "playwright install chromium".
+"""
+
+import argparse
+import asyncio
+import glob
+import hashlib
+import json
+import logging
 import sys
+import time
+
+from pathlib import Path
+
+from playwright.async_api import Browser, async_playwright
+from playwright.async_api import Error as PlaywrightError
+from playwright.async_api import TimeoutError as PlaywrightTimeoutError
+
+
+DEFAULT_CACHE = Path("build/prerender-cache.json")
+DEFAULT_JOBS = 4
+DEFAULT_TIMEOUT = 300.0
+POLL_INTERVAL_MS = 250
+# Consecutive idle checks required, so a cell that is about to be queued
+# (e.g. right after the kernel connects) is not mistaken for a finished one.
+STABLE_CHECKS = 4
+PHASES = ("load", "kernel", "cells", "serialize")
+FAILED = ("failed", "timeout")
+
+# marimo sets data-connection-state on #App; CONNECTING until the kernel (or
+# the WASM runtime) is up.
+KERNEL_READY_JS = """
+() => {
+    const app = document.getElementById("App");
+    return app !== null && app.dataset.connectionState !== "CONNECTING";
+}
+"""
+
+# Every cell carries data-status; the notebook is done when none is queued or
+# running for STABLE_CHECKS polls in a row.
+CELLS_RENDERED_JS = f"""
+() => {{
+    const busy = document.querySelector(
+        '[data-status="queued"], [data-status="running"]'
+    );
+    window.__prerenderIdle = busy ? 0 : (window.__prerenderIdle || 0) + 1;
+    return window.__prerenderIdle >= {STABLE_CHECKS};
+}}
+"""
+
+
+def expand_inputs(patterns: list[str]) -> list[Path]:
+    """Resolve file names and glob patterns, keeping order and dropping repeats."""
+    paths = []
+    for pattern in patterns:
+        matches = sorted(glob.glob(pattern)) or [pattern]
+        paths.extend(Path(m).resolve() for m in matches)
+    return list(dict.fromkeys(paths))
+
+
+def file_sha256(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def load_cache(cache_path: Path) -> dict[str, str]:
+    try:
+        return json.loads(cache_path.read_text())
+    except (OSError, json.JSONDecodeError):
+        return {}
+
 
-from playwright.sync_api import sync_playwright
+def save_cache(cache_path: Path, cache: dict[str, str]) -> None:
+    cache_path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = cache_path.with_suffix(".tmp")
+    temp_path.write_text(json.dumps(cache, indent=2))
+    temp_path.replace(cache_path)
 
 
-if len(sys.argv) != 3:
-    sys.exit("Usage: python prerender_marimo.py <input_html_path> <output_html_path>")
+class Timer:
+    """Record how long each phase of a render takes, in seconds."""
 
-input_path = os.path.abspath(sys.argv[1])
-output_path = os.path.abspath(sys.argv[2])
+    def __init__(self) -> None:
+        self.phases: dict[str, float] = {}
+        self.current = ""
+        self._start = time.perf_counter()
 
+    def start(self, phase: str) -> None:
+        now = time.perf_counter()
+        if self.current:
+            self.phases[self.current] = now - self._start
+        self.current, self._start = phase, now
 
-try:
-    subprocess.run(
-        ["playwright", "install", "chromium"], check=True, capture_output=True
+    def stop(self) -> dict[str, float]:
+        """Close the running phase; "current" keeps naming it."""
+        if self.current and self.current not in self.phases:
+            self.phases[self.current] = time.perf_counter() - self._start
+        return self.phases
+
+
+async def render(
+    browser: Browser, input_path: Path, output_path: Path, timer: Timer
+) -> None:
+    page = await browser.new_page()
+    # No per-step limit: the whole render is bounded by --timeout instead of
+    # Playwright's 30s default, which long-running cells would exceed.
+    page.set_default_timeout(0)
+    try:
+        timer.start("load")
+        await page.goto(input_path.as_uri(), wait_until="domcontentloaded")
+        timer.start("kernel")
+        await page.wait_for_function(KERNEL_READY_JS, polling=POLL_INTERVAL_MS)
+        timer.start("cells")
+        await page.wait_for_function(CELLS_RENDERED_JS, polling=POLL_INTERVAL_MS)
+        timer.start("serialize")
+        html = await page.content()
+        temp_path = output_path.with_suffix(".tmp")
+        temp_path.write_text(html, encoding="utf-8")
+        temp_path.replace(output_path)
+    finally:
+        await page.close()
+        timer.stop()
+
+
+def log_report(report: dict[str, dict]) -> None:
+    header = f"{'notebook':<32}{'status':<10}" + "".join(f"{p:>11}" for p in PHASES)
+    lines = [header]
+    for name, entry in report.items():
+        times = entry.get("phases", {})
+        lines.append(
+            f"{name:<32}{entry['status']:<10}"
+            + "".join(
+                f"{times[p]:>10.2f}s" if p in times else f"{'-':>11}" for p in PHASES
+            )
+        )
+    logging.info("Timing report:\n" + "\n".join(lines))
+
+
+async def render_all(
+    inputs: list[Path],
+    output_dir: Path,
+    jobs: int,
+    timeout: float,
+    force: bool,
+    cache_path: Path = DEFAULT_CACHE,
+) -> dict[str, dict]:
+    """
+    Render every changed notebook.
+
+    Returns a report with, for each notebook, its "status" ("rendered",
+    "skipped", "failed" or "timeout") and the seconds spent in each phase.
+    """
+    output_dir.mkdir(parents=True, exist_ok=True)
+    cache = load_cache(cache_path)
+
+    hashes = {path: file_sha256(path) for path in inputs}
+    pending = [
+        path
+        for path in inputs
+        if force
+        or cache.get(path.name) != hashes[path]
+        or not (output_dir / path.name).is_file()
+    ]
+    report = {}
+    for path in inputs:
+        if path not in pending:
+            logging.info(f"Unchanged, skipping: {path.name}")
+            report[path.name] = {"status": "skipped"}
+    if not pending:
+        return report
+
+    limit = asyncio.Semaphore(jobs)
+
+    async def render_one(browser: Browser, path: Path) -> None:
+        async with limit:
+            timer = Timer()
+            try:
+                await asyncio.wait_for(
+                    render(browser, path, output_dir / path.name, timer), timeout
+                )
+            except TimeoutError:
+                logging.error(
+                    f"Timed out after {timeout:.0f}s rendering {path.name} "
+                    f"(during {timer.current})"
+                )
+                status = "timeout"
+            except PlaywrightTimeoutError as e:
+                logging.error(
+                    f"Timed out rendering {path.name} (during {timer.current}): {e}"
+                )
+                status = "timeout"
+            except PlaywrightError as e:
+                logging.error(f"Failed to render {path.name}: {e}")
+                status = "failed"
+            else:
+                cache[path.name] = hashes[path]
+                logging.info(f"Rendered {path.name}")
+                status = "rendered"
+            report[path.name] = {"status": status, "phases": timer.phases}
+
+    async with async_playwright() as p:
+        try:
+            browser = await p.chromium.launch(headless=True)
+        except PlaywrightError as e:
+            sys.exit(
+                f"Error: {e}\nInstall the browser with: playwright install chromium"
+            )
+        try:
+            await asyncio.gather(*(render_one(browser, path) for path in pending))
+        finally:
+            await browser.close()
+
+    save_cache(cache_path, cache)
+    return {path.name: report[path.name] for path in inputs}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("inputs", nargs="+", help="exported HTML files or globs")
+    parser.add_argument("-o", "--output-dir", type=Path, default=Path("src/output"))
+    parser.add_argument("-j", "--jobs", type=int, default=DEFAULT_JOBS)
+    parser.add_argument(
+        "-t",
+        "--timeout",
+        type=float,
+        default=DEFAULT_TIMEOUT,
+        help="seconds allowed per notebook",
     )
+    parser.add_argument("--report", type=Path, help="write the timings as JSON")
+    parser.add_argument(
+        "--cache",
+        type=Path,
+        default=DEFAULT_CACHE,
+        help="where to keep the input hashes, outside OUTPUT_DIR",
+    )
+    parser.add_argument(
+        "--force", action="store_true", help="render even unchanged notebooks"
+    )
+    args = parser.parse_args()
 
-    with sync_playwright() as p:
-        browser = p.chromium.launch(headless=True)
-        page = browser.new_page()
-        page.goto(f"file:///{input_path}", wait_until="networkidle")
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s - %(message)s")
 
-        os.makedirs(os.path.dirname(output_path), exist_ok=True)
+    inputs = expand_inputs(args.inputs)
+    missing = [path for path in inputs if not path.is_file()]
+    if missing:
+        sys.exit(f"Error: no such file: {', '.join(map(str, missing))}")
+
+    report = asyncio.run(
+        render_all(
+            inputs,
+            args.output_dir.resolve(),
+            args.jobs,
+            args.timeout,
+            args.force,
+            args.cache.resolve(),
+        )
+    )
+    log_report(report)
+    if args.report:
+        args.report.write_text(json.dumps(report, indent=2))
 
-        with open(output_path, "w", encoding="utf-8") as f:
-            f.write(page.content())
+    failed = [name for name, entry in report.items() if entry["status"] in FAILED]
+    if failed:
+        sys.exit(f"Error: failed to render {', '.join(failed)}")
 
-        browser.close()
 
-except Exception as e:
-    sys.exit(f"Error: {e}")
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""
+Write simplified copies of the administrative boundary layers.
+
+Each layer in src/public/geojson is simplified as a coverage, so neighbouring
+polygons keep sharing the same edges (no gaps or overlaps), at every tolerance
+in TOLERANCES. The results go to src/public/geojson/simplified as
+"<layer>_<tolerance>.geojson", with only the ID and name columns and
+coordinates rounded to COORDINATE_PRECISION decimals. 03-population-map.py
+picks the coarsest file whose tolerance is below one pixel of the output.
+
+Usage: python scripts/simplify_layers.py [<geojson_dir>]
+"""
+
+import logging
+import sys
+import time
+
+from pathlib import Path
+
+import geopandas as gpd
+import shapely
+
+
+# Tolerances in degrees (about 1, 5 and 11 km at the equator). Keep in sync with
+# LAYER_TOLERANCES in src/03-population-map.py.
+TOLERANCES = (0.01, 0.05, 0.1)
+
+# 4 decimals is about 11 m, well below any tolerance above.
+COORDINATE_PRECISION = 4
+
+LAYER_COLUMNS = {
+    "departamental": ["FIRST_IDDP", "NOMBDEP"],
+    "provincial": ["FIRST_IDPR", "NOMBPROV", "FIRST_NOMB"],
+    "distrital": ["IDDIST", "IDDPTO", "IDPROV", "NOMBDIST", "NOMBPROV", "NOMBDEP"],
+}
+
+
+def simplify_layer(gdf: gpd.GeoDataFrame, tolerance: float) -> gpd.GeoDataFrame:
+    """Simplify all polygons of a layer together, preserving shared edges."""
+    result = gdf.copy()
+    # coverage_simplify cannot handle missing geometries; leave them as they are.
+    present = result.geometry.notna().to_numpy()
+    result.loc[present, "geometry"] = shapely.coverage_simplify(
+        result.geometry.to_numpy()[present], tolerance
+    )
+    return result
+
+
+def build(geojson_dir: Path) -> None:
+    out_dir = geojson_dir / "simplified"
+    out_dir.mkdir(exist_ok=True)
+
+    for layer, columns in LAYER_COLUMNS.items():
+        source = geojson_dir / f"{layer}.geojson"
+        gdf = gpd.read_file(source, columns=columns)
+        vertices = shapely.get_num_coordinates(gdf.geometry.to_numpy()).sum()
+
+        for tolerance in TOLERANCES:
+            start = time.perf_counter()
+            simplified = simplify_layer(gdf, tolerance)
+            target = out_dir / f"{layer}_{tolerance}.geojson"
+            simplified.to_file(
+                target,
+                driver="GeoJSON",
+                layer_options={"COORDINATE_PRECISION": COORDINATE_PRECISION},
+            )
+            kept = shapely.get_num_coordinates(simplified.geometry.to_numpy()).sum()
+            logging.info(
+                f"{target.name}: {kept:,}/{vertices:,} vertices, "
+                f"{source.stat().st_size / 1e6:.2f} MB -> "
+                f"{target.stat().st_size / 1e6:.2f} MB "
+                f"in {time.perf_counter() - start:.2f}s"
+            )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) > 2:
+        sys.exit("Usage: python simplify_layers.py [<geojson_dir>]")
+
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    # pyogrio logs every file it writes ("Created N records").
+    logging.getLogger("pyogrio").setLevel(logging.WARNING)
+    default_dir = Path(__file__).resolve().parent.parent / "src" / "public" / "geojson"
+    build(Path(sys.argv[1]) if len(sys.argv) == 2 else default_dir)
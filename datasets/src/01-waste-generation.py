@@ -13,7 +13,8 @@ with app.setup(hide_code=True):
     import marimo as mo
     import polars as pl
 
-    from utils.datasets import download
+    from utils.charts import chart_data
+    from utils.datasets import download_async, find_dataset_file, ingest, rollup
 
 
 @app.cell(hide_code=True)
@@ -50,13 +51,13 @@ def _():
 
 
 @app.cell
-def _(DATA_DIR):
+async def _(DATA_DIR):
     generation_datasets_urls = [
         "https://datosabiertos.gob.pe/dataset/generaci%C3%B3n-anual-de-residuos-s%C3%B3lidos-domiciliarios-y-municipales-ministerio-del-ambiente",
         "https://datosabiertos.gob.pe/dataset/residuos-municipales-generados-anualmente",
     ]
 
-    generation_all_files = download(generation_datasets_urls, DATA_DIR)
+    generation_all_files = await download_async(generation_datasets_urls, DATA_DIR)
 
     if generation_all_files:
         files_md = "Archivos descargados:\\n" + "".join(
@@ -69,22 +70,22 @@ def _(DATA_DIR):
         )
 
     generation_dataset_paths = {
-        "generacion_residuos": next(
-            (f for f in generation_all_files if "generacion_anual" in f.name), None
+        "generacion_residuos": find_dataset_file(
+            "generacion_residuos", generation_all_files
         )
     }
     return (generation_dataset_paths,)
 
 
 @app.cell
-def _(generation_dataset_paths):
+def _(DATA_DIR, generation_dataset_paths):
     # Cargar el dataset principal en un dataframe de Polars.
+    # El CSV se convierte a Parquet una sola vez, con los tipos declarados en
+    # utils.datasets.DATASETS; las siguientes ejecuciones leen directamente el
+    # Parquet.
     df_generacion = (
-        pl.read_csv(
-            generation_dataset_paths["generacion_residuos"],
-            encoding="latin1",
-            separator=";",
-            truncate_ragged_lines=True,
+        pl.read_parquet(
+            ingest(generation_dataset_paths["generacion_residuos"], DATA_DIR)[0]
         )
         if generation_dataset_paths["generacion_residuos"]
         else None
@@ -92,6 +93,24 @@ def _(generation_dataset_paths):
     return (df_generacion,)
 
 
+@app.cell
+def _(DATA_DIR, generation_dataset_paths):
+    # Totales por año, departamento, provincia y distrito, calculados una sola vez
+    # por versión del dataset. Los gráficos filtran esta tabla en lugar de
+    # agrupar el dataset completo en cada ejecución.
+    df_rollup = (
+        rollup(
+            generation_dataset_paths["generacion_residuos"],
+            DATA_DIR,
+            levels=["ANIO", "DEPARTAMENTO", "PROVINCIA", "DISTRITO"],
+            measures=["GENERACION_MUN_TANIO", "POB_TOTAL_INEI"],
+        )
+        if generation_dataset_paths["generacion_residuos"]
+        else None
+    )
+    return (df_rollup,)
+
+
 @app.cell(hide_code=True)
 def _():
     mo.md(r"""
@@ -117,15 +136,14 @@ def _():
 
 
 @app.cell
-def _(df_generacion):
-    if df_generacion is not None:
+def _(df_rollup):
+    if df_rollup is not None:
         df_time = (
-            df_generacion.group_by("ANIO")
-            .agg(
-                [
-                    pl.col("GENERACION_MUN_TANIO").sum().alias("Total_Toneladas"),
-                    pl.col("POB_TOTAL_INEI").sum().alias("Total_Poblacion"),
-                ]
+            df_rollup.filter(pl.col("LEVEL") == "ANIO")
+            .select(
+                "ANIO",
+                pl.col("GENERACION_MUN_TANIO").alias("Total_Toneladas"),
+                pl.col("POB_TOTAL_INEI").alias("Total_Poblacion"),
             )
             .with_columns(
                 (pl.col("Total_Toneladas") * 1000 / pl.col("Total_Poblacion")).alias(
@@ -136,7 +154,7 @@ def _(df_generacion):
         )
 
         line_chart = (
-            alt.Chart(df_time)
+            alt.Chart(chart_data(df_time))
             .mark_line(point=True, strokeWidth=2, color="steelblue")
             .encode(
                 x=alt.X("ANIO:O", title="Año"),
@@ -152,7 +170,9 @@ def _(df_generacion):
                 width="container",
             )
         )
-        mo.ui.altair_chart(line_chart)
+        # Los datos van en un archivo aparte (ver utils.charts.chart_data); el
+        # gráfico se muestra directamente, sin pasar los datos de vuelta a Python.
+        mo.output.replace(line_chart)
     return
 
 
@@ -167,15 +187,15 @@ def _():
 
 
 @app.cell
-def _(df_generacion):
-    if df_generacion is not None:
-        ultimo_año = df_generacion.select(pl.col("ANIO").max()).item()
+def _(df_rollup):
+    if df_rollup is not None:
+        df_distritos = df_rollup.filter(pl.col("LEVEL") == "DISTRITO")
+        ultimo_año = df_distritos.select(pl.col("ANIO").max()).item()
 
         df_ranking = (
-            df_generacion.filter(pl.col("ANIO") == ultimo_año)
+            df_distritos.filter(pl.col("ANIO") == ultimo_año)
             .select(["DISTRITO", "PROVINCIA", "DEPARTAMENTO", "GENERACION_MUN_TANIO"])
-            .sort("GENERACION_MUN_TANIO", descending=True)
-            .head(10)
+            .top_k(10, by="GENERACION_MUN_TANIO")
             .with_columns(
                 pl.concat_str(
                     [
@@ -191,7 +211,7 @@ def _(df_generacion):
         selection = alt.selection_point(on="mouseover", empty="all")
 
         bar_chart = (
-            alt.Chart(df_ranking)
+            alt.Chart(chart_data(df_ranking))
             .add_params(selection)
             .mark_bar()
             .encode(
@@ -211,7 +231,7 @@ def _(df_generacion):
                 width="container",
             )
         )
-        mo.ui.altair_chart(bar_chart)
+        mo.output.replace(bar_chart)
     return
 
 
@@ -13,7 +13,9 @@ with app.setup(hide_code=True):
     import plotly.express as px
     import polars as pl
 
+    import utils.charts
     import utils.datasets
+    import utils.geo
 
     logging.basicConfig(
         level=logging.INFO, format="%(asctime)s - %(levelname)s - %(message)s"
@@ -67,10 +69,12 @@ def _(DATA_DIR):
 
 @app.cell
 def _(downloaded_files):
-    valorization_org_path = next(f for f in downloaded_files if "org" in f.name.lower())
+    valorization_org_path = utils.datasets.find_dataset_file(
+        "valorizacion_organica", downloaded_files
+    )
 
-    valorization_inorg_path = next(
-        f for f in downloaded_files if "inorg" in f.name.lower()
+    valorization_inorg_path = utils.datasets.find_dataset_file(
+        "valorizacion_inorganica", downloaded_files
     )
 
     output = f"- Orgánico: `{valorization_org_path.name}`\n- Inorgánico: `{valorization_inorg_path.name}`"
@@ -87,60 +91,40 @@ def _():
 
 
 @app.cell
-def _(valorization_inorg_path, valorization_org_path):
-    valorization_org_raw = pl.read_csv(
-        valorization_org_path,
-        separator=";",
-        encoding="latin1",
-        infer_schema_length=0,
+def _(DATA_DIR, valorization_inorg_path, valorization_org_path):
+    # Los CSV se convierten a Parquet una sola vez (ver utils.datasets.ingest),
+    # con nombres de columna normalizados y tipos declarados en
+    # utils.datasets.DATASETS.
+    valorization_org_parquet, valorization_inorg_parquet = utils.datasets.ingest(
+        [valorization_org_path, valorization_inorg_path], DATA_DIR
     )
 
-    valorization_inorg_raw = pl.read_csv(
-        valorization_inorg_path,
-        separator=";",
-        encoding="latin1",
-        infer_schema_length=0,
-    )
-    mo.md(
-        f"- Orgánicos: {valorization_org_raw.shape[0]:,} filas cargadas.\n"
-        f"- Inorgánicos: {valorization_inorg_raw.shape[0]:,} filas cargadas."
-    )
-    return valorization_inorg_raw, valorization_org_raw
+    # Consultas diferidas: solo se leen las columnas y filas que use el resultado
+    # final, y todo se ejecuta en un único collect().
+    valorization_org = pl.scan_parquet(valorization_org_parquet)
 
+    valorization_inorg = pl.scan_parquet(valorization_inorg_parquet)
 
-@app.function(hide_code=True)
-def normalize_cols(df):
-    """Normaliza nombres de columnas a mayúsculas sin tildes ni espacios."""
-
-    def clean(col):
-        return (
-            col.replace("ï»¿", "")
-            .replace("Ï»¿", "")
-            .strip()
-            .upper()
-            .replace(" ", "_")
-            .replace("Á", "A")
-            .replace("É", "E")
-            .replace("Í", "I")
-            .replace("Ó", "O")
-            .replace("Ú", "U")
-        )
-
-    return df.rename({c: clean(c) for c in df.columns})
+    # El número de filas sale de los metadatos del Parquet, sin leer los datos.
+    org_rows = valorization_org.select(pl.len()).collect().item()
+    inorg_rows = valorization_inorg.select(pl.len()).collect().item()
+    mo.md(
+        f"- Orgánicos: {org_rows:,} filas cargadas.\n"
+        f"- Inorgánicos: {inorg_rows:,} filas cargadas."
+    )
+    return valorization_inorg, valorization_org
 
 
 @app.cell
-def _(valorization_org_raw):
-    valorization_org = normalize_cols(valorization_org_raw)
-    valorization_org.head()
+def _(valorization_org):
+    valorization_org.head().collect()
     return
 
 
 @app.cell
-def _(valorization_inorg_raw):
-    valorization_inorg = normalize_cols(valorization_inorg_raw)
-    valorization_inorg.head()
-    return (valorization_inorg,)
+def _(valorization_inorg):
+    valorization_inorg.head().collect()
+    return
 
 
 @app.cell(hide_code=True)
@@ -151,48 +135,103 @@ def _():
     return
 
 
+@app.cell
+def _():
+    # Tabla de nombres normalizados -> UBIGEO, construida una sola vez a partir
+    # del mapa distrital (ver utils.geo.ubigeo_table).
+    ubigeo_table = utils.geo.ubigeo_table(
+        resolve_data_path("geojson", "distrital.geojson")
+    )
+    return (ubigeo_table,)
+
+
 @app.function(hide_code=True)
-def process_df(df, col_name, new_col_name):
-    return (
-        df.with_columns(
-            pl.col(col_name)
-            .cast(str)
-            .str.replace_all(r"[^\d.]", "")
-            .cast(pl.Float64, strict=False)
-            .fill_null(0.0)
-            .alias(new_col_name)
+def location_columns(df):
+    """Columnas de ubicación del dataset, incluido su propio UBIGEO si lo trae."""
+    names = df.collect_schema().names()
+    return [
+        c for c in ["UBIGEO", "DEPARTAMENTO", "PROVINCIA", "DISTRITO"] if c in names
+    ]
+
+
+@app.function(hide_code=True)
+def process_df(df, col_name, new_col_name, ubigeo_table):
+    """Suma por distrito (UBIGEO) una columna de toneladas."""
+    keys = ["DEPARTAMENTO", "PROVINCIA", "DISTRITO"]
+    # La columna ya se guarda como número en el Parquet (ver
+    # utils.datasets.DATASETS), así que no hace falta limpiarla aquí.
+    tons = pl.col(col_name)
+
+    # El UBIGEO del propio dataset tiene prioridad; los nombres solo se usan
+    # para las filas que no lo traen (ver utils.geo.with_ubigeo).
+    resolved = utils.geo.with_ubigeo(
+        df.select(
+            *location_columns(df),
+            tons.cast(pl.Float64).fill_null(0.0).alias(new_col_name),
+        ),
+        ubigeo_table,
+    )
+    # Se agrupa por el código entero en lugar de los tres nombres de texto. Las
+    # filas cuyo distrito no se pudo identificar se suman por nombre, para no
+    # perder sus toneladas.
+    by_code = (
+        resolved.filter(pl.col("UBIGEO").is_not_null())
+        .group_by("UBIGEO")
+        .agg(pl.col(keys).first(), pl.col(new_col_name).sum())
+    )
+    by_name = (
+        resolved.filter(pl.col("UBIGEO").is_null())
+        .group_by(keys)
+        .agg(pl.col("UBIGEO").first(), pl.col(new_col_name).sum())
+    )
+    return pl.concat([by_code, by_name], how="diagonal")
+
+
+@app.cell
+def _(ubigeo_table, valorization_inorg):
+    unresolved = (
+        utils.geo.with_ubigeo(
+            valorization_inorg.select(location_columns(valorization_inorg)),
+            ubigeo_table,
         )
-        .group_by(["DEPARTAMENTO", "PROVINCIA", "DISTRITO"])
-        .agg(pl.col(new_col_name).sum())
+        .filter(pl.col("UBIGEO").is_null())
+        .select("DEPARTAMENTO", "PROVINCIA", "DISTRITO")
+        .unique()
+        .collect()
     )
+    # Estos distritos se suman por nombre, sin código.
+    mo.vstack([mo.md(f"Distritos sin UBIGEO: {unresolved.height}"), unresolved])
+    return
 
 
 @app.cell
-def _(valorization_inorg):
+def _(ubigeo_table, valorization_inorg):
     # Inorgánicos
     valorization_inorg_agg = process_df(
-        valorization_inorg, "QRESIDUOS__VAL_INORGAN", "INORG_TON"
+        valorization_inorg, "QRESIDUOS__VAL_INORGAN", "INORG_TON", ubigeo_table
     )
 
     # Orgánicos
-    valorization_org_agg = (
-        valorization_inorg.with_columns(pl.lit(0.0).alias("ORG_TON"))
-        .group_by(["DEPARTAMENTO", "PROVINCIA", "DISTRITO"])
-        .agg(pl.col("ORG_TON").sum())
+    valorization_org_agg = valorization_inorg_agg.select(
+        "UBIGEO", "DEPARTAMENTO", "PROVINCIA", "DISTRITO", pl.lit(0.0).alias("ORG_TON")
     )
     return valorization_inorg_agg, valorization_org_agg
 
 
 @app.cell
 def _(valorization_inorg_agg, valorization_org_agg):
-    valorization_total = valorization_org_agg.join(
-        valorization_inorg_agg,
-        on=["DEPARTAMENTO", "PROVINCIA", "DISTRITO"],
-        how="full",
-    ).with_columns([pl.all().fill_null(0.0)])
-
-    valorization_total = valorization_total.with_columns(
-        (pl.col("ORG_TON") + pl.col("INORG_TON")).alias("TOTAL_TON")
+    valorization_total = (
+        # Las filas sin UBIGEO se emparejan por nombre (nulls_equal).
+        valorization_org_agg.join(
+            valorization_inorg_agg,
+            on=["UBIGEO", "DEPARTAMENTO", "PROVINCIA", "DISTRITO"],
+            how="full",
+            coalesce=True,
+            nulls_equal=True,
+        )
+        .with_columns(pl.col("ORG_TON", "INORG_TON").fill_null(0.0))
+        .with_columns((pl.col("ORG_TON") + pl.col("INORG_TON")).alias("TOTAL_TON"))
+        .collect()
     )
     return (valorization_total,)
 
@@ -222,8 +261,9 @@ def _(valorization_total):
         )
     )
 
+    # plotly lee el DataFrame de polars directamente, sin copiarlo a pandas.
     fig = px.bar(
-        top10.to_pandas(),
+        utils.charts.plotly_data(top10),
         x="ETIQUETA",
         y=["ORG_TON", "INORG_TON"],
         barmode="stack",
@@ -21,6 +21,42 @@ with app.setup(hide_code=True):
         )
         return str(base / "public" / PurePath(*parts))
 
+    def read_layer(path: str, columns=None) -> gpd.GeoDataFrame:
+        """
+        Read a boundary layer, through its GeoParquet cache when it is a local file.
+
+        Under WASM the layer is a URL under 'public', which is all the export
+        ships, so it is read directly instead.
+        """
+        if "://" not in path:
+            # Only imported locally: 'utils' is not part of the WASM export.
+            from utils.geo import read_layer as read_cached_layer
+
+            return read_cached_layer(path, columns=columns)
+        gdf = gpd.read_file(path)
+        # Some layers pad their column names (e.g. " T_TOTAL").
+        gdf.columns = gdf.columns.str.strip()
+        return gdf if columns is None else gdf[[*columns, "geometry"]]
+
+    # Tolerances (in degrees) of the layers written by scripts/simplify_layers.py.
+    LAYER_TOLERANCES = (0.01, 0.05, 0.1)
+
+    # Largest side of Peru's bounding box, in degrees (latitude).
+    PERU_SPAN_DEG = 18.3
+
+    def resolve_layer_path(layer: str, width_px: float) -> str:
+        """
+        Return the coarsest simplified version of a boundary layer whose error
+        stays under one pixel when the whole country is drawn width_px wide.
+        """
+        degrees_per_px = PERU_SPAN_DEG / width_px
+        fitting = [t for t in LAYER_TOLERANCES if t <= degrees_per_px]
+        if not fitting:
+            return resolve_data_path("geojson", f"{layer}.geojson")
+        return resolve_data_path(
+            "geojson", "simplified", f"{layer}_{max(fitting)}.geojson"
+        )
+
 
 @app.cell(hide_code=True)
 def _():
@@ -44,14 +80,17 @@ def _():
 
 @app.cell
 def _():
-    mapa_departamental_path = resolve_data_path("geojson", "departamental.geojson")
-    mapa_departamental_peru = gpd.read_file(mapa_departamental_path)
-    return (mapa_departamental_peru,)
+    figsize_dep = (8, 8)
+    mapa_departamental_path = resolve_layer_path(
+        "departamental", figsize_dep[0] * plt.rcParams["figure.dpi"]
+    )
+    mapa_departamental_peru = read_layer(mapa_departamental_path)
+    return figsize_dep, mapa_departamental_peru
 
 
 @app.cell
-def _(mapa_departamental_peru):
-    fig_dep, ax_dep = plt.subplots(1, 1, figsize=(8, 8))
+def _(figsize_dep, mapa_departamental_peru):
+    fig_dep, ax_dep = plt.subplots(1, 1, figsize=figsize_dep)
     mapa_departamental_peru.plot(ax=ax_dep, edgecolor="gray", cmap="Pastel1")
 
     # set up the figure
@@ -75,14 +114,19 @@ def _():
 
 @app.cell
 def _():
-    mapa_distrital_path = resolve_data_path("geojson", "distrital.geojson")
-    mapa_distrital = gpd.read_file(mapa_distrital_path)
-    return (mapa_distrital,)
+    # A simplified layer is enough for the national map: it differs from the
+    # original by less than a pixel and has far fewer vertices to load and draw.
+    figsize_dist = (8, 8)
+    mapa_distrital_path = resolve_layer_path(
+        "distrital", figsize_dist[0] * plt.rcParams["figure.dpi"]
+    )
+    mapa_distrital = read_layer(mapa_distrital_path)
+    return figsize_dist, mapa_distrital
 
 
 @app.cell
-def _(mapa_distrital):
-    fig_dist, ax_dist = plt.subplots(1, 1, figsize=(8, 8))
+def _(figsize_dist, mapa_distrital):
+    fig_dist, ax_dist = plt.subplots(1, 1, figsize=figsize_dist)
 
     mapa_distrital.plot(ax=ax_dist, edgecolor="gray", linewidth=0.2, cmap="Pastel2")
 
@@ -109,53 +153,17 @@ def _():
 
 @app.cell
 def _():
-    # This cell loads and cleans the attribute data from the DBF file.
-    manzana_dbf_path = resolve_data_path("lima", "manzana.dbf")
-    df_attrs = gpd.read_file(manzana_dbf_path)
-    df_attrs = df_attrs.drop(columns="geometry", errors="ignore")
-    df_attrs.columns = df_attrs.columns.str.strip()
-
-    cols_to_drop = [
-        "contacto",
-        "whatsapp",
-        "descargar",
-        "ARCHIVO",
-        "IDPROV",
-        "NOMBDEP",
-        "NOMBPROV",
-        "AREA",
-        "CODCCPP",
-        "LLAVE_MZS",
-    ]
-    df_attrs = df_attrs.drop(columns=cols_to_drop, errors="ignore")
-    return (df_attrs,)
-
-
-@app.cell(hide_code=True)
-def _():
-    mo.md(r"""
-    Then we load the shapefile and merge it with the attribute data (without this step, we wouldn't know the actual locations!)
-    """)
-    return
-
-
-@app.cell
-def _(df_attrs):
-    manzana_shp_path = resolve_data_path("lima", "manzana.shp")
-    manzana_gdf = gpd.read_file(manzana_shp_path)
-    manzana_gdf.columns = manzana_gdf.columns.str.strip()
-    manzana_gdf = manzana_gdf.drop(columns=["T_TOTAL"], errors="ignore")
-
-    manzana_merged_gdf = manzana_gdf.merge(
-        df_attrs[["Mz", "T_TOTAL"]], on="Mz", how="left"
-    )
-    return (manzana_merged_gdf,)
+    # Geometry and the population column are read together in one pass, so the
+    # attributes do not have to be read again and joined back on "Mz".
+    manzana_path = resolve_data_path("lima", "manzana.shp")
+    manzana_gdf = read_layer(manzana_path, columns=["Mz", "T_TOTAL"])
+    return (manzana_gdf,)
 
 
 @app.cell
-def _(manzana_merged_gdf):
+def _(manzana_gdf):
     fig, ax = plt.subplots(1, 1, figsize=(12, 12))
-    manzana_merged_gdf.plot(
+    manzana_gdf.plot(
         column="T_TOTAL",
         ax=ax,
         legend=True,
@@ -0,0 +1,68 @@
+import hashlib
+
+from pathlib import Path
+from typing import TYPE_CHECKING, Optional, Union
+
+import altair as alt
+import marimo as mo
+import polars as pl
+
+
+if TYPE_CHECKING:
+    import pyarrow as pa
+
+
+CHART_DATA_DIR = "charts"
+
+
+def chart_data(df: pl.DataFrame, public_dir: Optional[Path] = None) -> alt.UrlData:
+    """
+    Write chart data to an external JSON file and return a URL reference to it.
+
+    The file is named after a hash of its contents and written under
+    "public/charts" next to the notebook, so charts built from the same table
+    share one file and reruns do not write it again. Pass frames that are
+    already aggregated and limited to the encoded columns; the spec only
+    carries the URL, so it stays small and Altair's row limit does not apply.
+
+    Display these charts directly (not through mo.ui.altair_chart, which loads
+    the data back into Python) and deploy "public/charts" next to the exported
+    HTML.
+
+    Args:
+        df: Data for the chart.
+        public_dir: The notebook's "public" directory. Defaults to the one next
+            to the running notebook.
+
+    Returns:
+        Data to pass to alt.Chart().
+    """
+    payload = df.write_json().encode()
+    filename = f"{hashlib.sha256(payload).hexdigest()[:16]}.json"
+
+    charts_dir = (public_dir or Path(mo.notebook_dir()) / "public") / CHART_DATA_DIR
+    path = charts_dir / filename
+    if not path.is_file():
+        charts_dir.mkdir(parents=True, exist_ok=True)
+        part_path = path.with_name(f"{filename}.part")
+        part_path.write_bytes(payload)
+        part_path.replace(path)
+
+    return alt.UrlData(
+        url=f"public/{CHART_DATA_DIR}/{filename}", format=alt.DataFormat(type="json")
+    )
+
+
+def plotly_data(data: Union[pl.DataFrame, pl.LazyFrame, "pa.Table"]) -> pl.DataFrame:
+    """
+    Return chart data in a form plotly express reads without converting it.
+
+    plotly (>= 6) reads polars frames natively through narwhals, so there is no
+    need for to_pandas(). Lazy frames are collected and Arrow tables are wrapped
+    without copying.
+    """
+    if isinstance(data, pl.LazyFrame):
+        return data.collect()
+    if isinstance(data, pl.DataFrame):
+        return data
+    return pl.from_arrow(data)
@@ -1,29 +1,352 @@
+import asyncio
+import csv
+import hashlib
 import json
 import logging
+import os
+import random
 import re
+import shutil
+import threading
 import time
 
-from datetime import datetime
+from collections.abc import AsyncIterator, Callable, Iterable, Iterator
+from concurrent.futures import Executor, ThreadPoolExecutor
+from contextlib import (
+    AbstractContextManager,
+    ExitStack,
+    asynccontextmanager,
+    contextmanager,
+    nullcontext,
+)
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta
 from pathlib import Path
 from typing import TYPE_CHECKING, Optional, Union
 from urllib.parse import urljoin, urlparse
 
+import polars as pl
 import requests
 
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, SoupStrainer, Tag
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
 
+try:
+    import fcntl
+except ImportError:  # Windows
+    fcntl = None
+    import msvcrt
+
 if TYPE_CHECKING:
     from collections.abc import Sequence
 
 METADATA_FILE = "manifest.json"
+METADATA_LOCK_FILE = "manifest.json.lock"
+PAGES_FILE = "pages.json"
+HOSTS_FILE = "hosts.json"
+BLOB_DIR = "blobs"
+DEFAULT_MAX_PER_HOST = 4
+DEFAULT_POOL_SIZE = 10
+DEFAULT_CHECKPOINT_INTERVAL = 30.0
+DEFAULT_PAGE_MAX_AGE = 24 * 60 * 60
+CHUNK_SIZE = 64 * 1024
+PARQUET_COMPRESSION = "zstd"
+BACKOFF_BASE = 1.0
+BACKOFF_MAX = 30.0
+DEFAULT_TIMEOUT = 30.0
+DEFAULT_FAILURE_THRESHOLD = 3
+DEFAULT_COOLDOWN = 15 * 60
+# Adaptive timeouts: this many times a host's smoothed response time, but at
+# least MIN_TIMEOUT seconds.
+LATENCY_TIMEOUT_FACTOR = 5
+MIN_TIMEOUT = 5.0
+LATENCY_SMOOTHING = 0.3
+EVENT_STAGES = ("page", "links", "cache", "download", "fallback")
+
+_default_session: Optional[requests.Session] = None
+_default_session_lock = threading.Lock()
+
+# "https://web.archive.org/web/<timestamp>/" in front of an archived URL.
+_ARCHIVE_PREFIX = re.compile(r"^https?://web\.archive\.org/web/[^/]+/")
+
+# One lock per target file, so two workers never write the same ".part" file.
+_file_locks: dict[Path, threading.Lock] = {}
+_file_locks_guard = threading.Lock()
+
+
+class HostLimiter:
+    """Bound the number of in-flight requests sent to each host."""
+
+    def __init__(self, max_per_host: int = DEFAULT_MAX_PER_HOST) -> None:
+        self.max_per_host = max_per_host
+        self._semaphores: dict[str, threading.BoundedSemaphore] = {}
+        self._lock = threading.Lock()
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        """Block until a request slot for the URL's host is available."""
+        host = urlparse(url).netloc
+        with self._lock:
+            semaphore = self._semaphores.setdefault(
+                host, threading.BoundedSemaphore(self.max_per_host)
+            )
+        with semaphore:
+            yield
+
+
+@dataclass
+class Event:
+    """
+    One timed step of a download, passed to EventLog callbacks.
+
+    "stage" is one of EVENT_STAGES:
+
+    - "page": a dataset page request, with the page's size in bytes.
+    - "links": parsing the CSV links out of a page.
+    - "cache": a manifest lookup; "cache" is "hit", "stale" (cached, but to be
+      checked with the server) or "miss".
+    - "download": fetching one file, across retries; "cache" is
+      "not_modified" when the server confirmed the cached copy.
+    - "fallback": a request to archive.org after the primary one failed, with
+      the archive.org URL.
+
+    "source" is "primary" or "archive" for requests, and "error" describes a
+    failed step. The "url" of a page or download is the one that served it,
+    so a transfer is charged to archive.org when it answered instead.
+    """
+
+    stage: str
+    url: str
+    duration: float = 0.0
+    bytes: int = 0
+    status: Optional[int] = None
+    source: Optional[str] = None
+    cache: Optional[str] = None
+    error: Optional[str] = None
+
+
+class EventLog:
+    """
+    Collect the Events of one or more downloads and pass each to callbacks.
+
+    download() records every page fetch, link extraction, cache lookup, file
+    download and archive.org fallback, and logs the summary() when it ends;
+    pass it an EventLog to follow the events as they happen or to read the
+    summary afterwards.
+
+    Callbacks are called from the worker threads, as soon as a step ends, and
+    must be thread-safe. Exceptions they raise are logged and ignored.
+    """
+
+    def __init__(self, *callbacks: Callable[[Event], None]) -> None:
+        self.events: list[Event] = []
+        self.callbacks = list(callbacks)
+        self._lock = threading.Lock()
+
+    def emit(self, event: Event) -> None:
+        with self._lock:
+            self.events.append(event)
+        for callback in self.callbacks:
+            try:
+                callback(event)
+            except Exception:
+                logging.exception(f"Event callback failed on {event.stage} event")
+
+    def summary(self) -> dict:
+        """
+        Summarize the events recorded so far.
+
+        Returns a dictionary with, per stage, the number of events, their total
+        duration and bytes; the count of each cache outcome and the hit rate of
+        file and page lookups; how many pages and files each source served;
+        and per host, the requests, total and slowest durations and bytes,
+        slowest host first.
+
+        Lookups whose cached copy the server confirmed ("not_modified") count
+        as hits, so a revalidation that transfers nothing has a 100% hit rate.
+        """
+        with self._lock:
+            events = list(self.events)
+
+        stages = {
+            stage: {"count": 0, "seconds": 0.0, "bytes": 0} for stage in EVENT_STAGES
+        }
+        cache: dict[str, int] = {}
+        sources: dict[str, int] = {}
+        hosts: dict[str, dict] = {}
+        errors = 0
+        for event in events:
+            totals = stages.setdefault(
+                event.stage, {"count": 0, "seconds": 0.0, "bytes": 0}
+            )
+            totals["count"] += 1
+            totals["seconds"] += event.duration
+            totals["bytes"] += event.bytes
+            errors += event.error is not None
+            if event.cache:
+                cache[event.cache] = cache.get(event.cache, 0) + 1
+            if event.stage in ("page", "download") and event.source:
+                sources[event.source] = sources.get(event.source, 0) + 1
+            if event.stage in ("page", "download", "fallback"):
+                host = urlparse(event.url).netloc
+                entry = hosts.setdefault(
+                    host,
+                    {"requests": 0, "seconds": 0.0, "max_seconds": 0.0, "bytes": 0},
+                )
+                entry["requests"] += 1
+                entry["seconds"] += event.duration
+                entry["max_seconds"] = max(entry["max_seconds"], event.duration)
+                entry["bytes"] += event.bytes
+
+        lookups = stages["cache"]["count"]
+        hits = cache.get("hit", 0) + cache.get("not_modified", 0)
+        return {
+            "stages": stages,
+            "cache": {**cache, "hit_rate": hits / lookups if lookups else None},
+            "sources": sources,
+            "errors": errors,
+            "hosts": dict(sorted(hosts.items(), key=lambda item: -item[1]["seconds"])),
+        }
+
+
+@contextmanager
+def _record(
+    events: Optional[EventLog], stage: str, url: str, **fields
+) -> Iterator[Event]:
+    """Time the enclosed step as an Event, emitted on exit if events is given."""
+    event = Event(stage, url, **fields)
+    start = time.perf_counter()
+    try:
+        yield event
+    except Exception as e:
+        event.error = event.error or str(e)
+        raise
+    finally:
+        event.duration = time.perf_counter() - start
+        if events:
+            events.emit(event)
 
 
-def _load_metadata(data_dir: Path) -> dict[str, dict]:
+def _is_archive(url: str) -> bool:
+    return "web.archive.org" in url
+
+
+def _response_source(response: requests.Response) -> str:
+    return "archive" if _is_archive(response.url) else "primary"
+
+
+class AsyncHostLimiter:
+    """Bound the number of in-flight requests sent to each host, on one event loop."""
+
+    def __init__(self, max_per_host: int = DEFAULT_MAX_PER_HOST) -> None:
+        self.max_per_host = max_per_host
+        self._semaphores: dict[str, asyncio.Semaphore] = {}
+
+    @asynccontextmanager
+    async def slot(self, url: str) -> AsyncIterator[None]:
+        """Wait until a request slot for the URL's host is available."""
+        host = urlparse(url).netloc
+        semaphore = self._semaphores.setdefault(
+            host, asyncio.Semaphore(self.max_per_host)
+        )
+        async with semaphore:
+            yield
+
+
+def create_session(
+    pool_size: int = DEFAULT_POOL_SIZE,
+    max_retries: int = 2,
+    host_pool_sizes: Optional[dict[str, int]] = None,
+) -> requests.Session:
+    """
+    Create an HTTP session that keeps connections alive and reuses them per host.
+
+    Args:
+        pool_size: Connections kept open per host; should be at least the
+            max_per_host used with download().
+        max_retries: Retries for 502/503/504 responses, before falling back
+            to archive.org. Hosts that cannot be reached are not retried here:
+            the fallback and the circuit breaker (see HostHealth) handle them
+            without waiting out the timeout again.
+        host_pool_sizes: Pool sizes for specific URL prefixes, e.g.
+            {"https://web.archive.org": 2}.
+
+    Returns:
+        A "requests.Session" that can be passed to download() and the fetch helpers.
+    """
+    retry = Retry(
+        total=max_retries,
+        connect=0,
+        read=0,
+        other=0,
+        status_forcelist=(502, 503, 504),
+        allowed_methods=("GET", "HEAD"),
+        backoff_factor=0.5,
+        raise_on_status=False,
+    )
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_maxsize=pool_size, max_retries=retry)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    for prefix, size in (host_pool_sizes or {}).items():
+        session.mount(prefix, HTTPAdapter(pool_maxsize=size, max_retries=retry))
+    return session
+
+
+def default_session() -> requests.Session:
+    """Return the session shared by all downloads that do not pass their own."""
+    global _default_session
+    with _default_session_lock:
+        if _default_session is None:
+            _default_session = create_session()
+        return _default_session
+
+
+def _slot(limiter: Optional[HostLimiter], url: str) -> AbstractContextManager:
+    """Return a request slot for the URL, or a no-op context without a limiter."""
+    return limiter.slot(url) if limiter else nullcontext()
+
+
+def _file_lock(filepath: Path) -> threading.Lock:
+    """Return the lock guarding writes to the given target file."""
+    with _file_locks_guard:
+        return _file_locks.setdefault(filepath, threading.Lock())
+
+
+def _map_ordered(executor: Optional[Executor], fn: Callable, items: Iterable) -> list:
+    """Apply fn to every item, concurrently if an executor is given, keeping order."""
+    if executor is None:
+        return [fn(item) for item in items]
+    return list(executor.map(fn, items))
+
+
+def canonical_url(url: str) -> str:
+    """Return the original URL of an archive.org copy, or the URL itself."""
+    return _ARCHIVE_PREFIX.sub("", url)
+
+
+def _link(source: Path, target: Path) -> None:
+    """
+    Atomically make target a hard link to source.
+
+    Falls back to a copy on file systems without hard links.
+    """
+    temp_path = target.with_name(f"{target.name}.link")
+    temp_path.unlink(missing_ok=True)
+    try:
+        os.link(source, temp_path)
+    except OSError:
+        shutil.copy2(source, temp_path)
+    temp_path.replace(target)
+
+
+def _load_metadata(data_dir: Path, filename: str = METADATA_FILE) -> dict[str, dict]:
     """
     Load cached download metadata if available, otherwise return an empty dictionary.
     """
-    metadata_path = data_dir / METADATA_FILE
+    metadata_path = data_dir / filename
     if metadata_path.exists():
         try:
             return json.loads(metadata_path.read_text())
@@ -32,9 +355,11 @@ def _load_metadata(data_dir: Path) -> dict[str, dict]:
     return {}
 
 
-def _save_metadata(data_dir: Path, metadata: dict[str, dict]) -> None:
+def _save_metadata(
+    data_dir: Path, metadata: dict[str, dict], filename: str = METADATA_FILE
+) -> None:
     """Write metadata to disk atomically, replacing the previous file."""
-    metadata_path = data_dir / METADATA_FILE
+    metadata_path = data_dir / filename
     try:
         temp_path = metadata_path.with_suffix(".tmp")
         temp_path.write_text(json.dumps(metadata, indent=2))
@@ -43,27 +368,348 @@ def _save_metadata(data_dir: Path, metadata: dict[str, dict]) -> None:
         logging.error(f"Failed to save metadata: {e}")
 
 
-def _record_download(data_dir: Path, url: str, title: str, filename: str) -> None:
-    """Record a successful download in the metadata manifest."""
-    metadata = _load_metadata(data_dir)
-    metadata[filename] = {
-        "url": url,
-        "title": title,
-        "timestamp": datetime.now().isoformat(),
-    }
-    _save_metadata(data_dir, metadata)
-
-
-def _find_cached_file(data_dir: Path, url: str) -> Optional[Path]:
-    """Return the cached file path for a given URL if it exists and is valid."""
-    metadata = _load_metadata(data_dir)
-    for filename, record in metadata.items():
-        if record.get("url") == url:
-            filepath = data_dir / filename
-            if filepath.is_file():
-                logging.info(f"Cache hit: {filepath.name}")
-                return filepath
-    return None
+@contextmanager
+def _interprocess_lock(lock_path: Path) -> Iterator[None]:
+    """Hold an exclusive OS-level lock on lock_path, shared across processes."""
+    with lock_path.open("a+b") as f:
+        if fcntl:
+            fcntl.flock(f.fileno(), fcntl.LOCK_EX)
+        else:
+            f.seek(0)
+            msvcrt.locking(f.fileno(), msvcrt.LK_LOCK, 1)
+        try:
+            yield
+        finally:
+            if fcntl:
+                fcntl.flock(f.fileno(), fcntl.LOCK_UN)
+            else:
+                f.seek(0)
+                msvcrt.locking(f.fileno(), msvcrt.LK_UNLCK, 1)
+
+
+class Manifest:
+    """
+    In-memory view of a data directory's manifest, indexed by URL.
+
+    The manifest file is read once. New records are kept in memory and written in
+    one atomic flush, either when the manifest is closed or once
+    checkpoint_interval seconds have passed since the last flush. Each flush
+    merges with the file on disk under a file lock, so several processes can
+    share a data directory without losing each other's records.
+
+    The CSV links found on each dataset page are cached the same way, in
+    pages.json, so unchanged pages do not have to be downloaded and parsed again.
+
+    Downloaded content is kept once per SHA-256 in a blob store ("blobs" in the
+    data directory); each recorded filename is an alias, hard-linked to its
+    blob. Records are found by canonical URL, so an archive.org copy of a file
+    resolves to the same record as the original.
+    """
+
+    def __init__(
+        self,
+        data_dir: Path,
+        checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+    ) -> None:
+        self.data_dir = data_dir
+        self.checkpoint_interval = checkpoint_interval
+        self._records = _load_metadata(data_dir)
+        self._by_url = self._index(self._records)
+        self._pending: dict[str, dict] = {}
+        self._pages = _load_metadata(data_dir, PAGES_FILE)
+        self._pending_pages: dict[str, dict] = {}
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "Manifest":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.flush()
+
+    @staticmethod
+    def _index(records: dict[str, dict]) -> dict[str, str]:
+        return {
+            canonical_url(r["url"]): filename
+            for filename, r in records.items()
+            if "url" in r
+        }
+
+    def find(self, url: str) -> Optional[tuple[Path, dict]]:
+        """
+        Return the cached file path and record for a URL, if the file exists.
+
+        An alias that was deleted is restored from its blob.
+        """
+        with self._lock:
+            filename = self._by_url.get(canonical_url(url))
+            record = self._records.get(filename) if filename else None
+        if record is None:
+            return None
+        filepath = self.data_dir / filename
+        if not filepath.is_file():
+            blob = self.blob_path(record["sha256"]) if "sha256" in record else None
+            if not blob or not blob.is_file():
+                return None
+            _link(blob, filepath)
+        return filepath, record
+
+    def blob_path(self, sha256: str) -> Path:
+        """Return where content with the given SHA-256 is stored."""
+        return self.data_dir / BLOB_DIR / sha256[:2] / sha256
+
+    def aliases(self, sha256: str) -> list[str]:
+        """Return the recorded filenames whose content has the given SHA-256."""
+        with self._lock:
+            return [
+                filename
+                for filename, record in self._records.items()
+                if record.get("sha256") == sha256
+            ]
+
+    def store(self, filepath: Path, sha256: str) -> None:
+        """
+        Add a downloaded file to the blob store, keeping one copy per content.
+
+        If the content is already stored, filepath is replaced by a link to the
+        existing blob; otherwise it becomes the blob.
+        """
+        blob = self.blob_path(sha256)
+        with _file_lock(blob):
+            if not blob.is_file():
+                blob.parent.mkdir(parents=True, exist_ok=True)
+                _link(filepath, blob)
+            elif not os.path.samefile(blob, filepath):
+                logging.info(f"Same content as a stored file: {filepath.name}")
+                _link(blob, filepath)
+
+    def release(self, sha256: str) -> None:
+        """Delete a blob once no recorded filename refers to it."""
+        if self.aliases(sha256):
+            return
+        blob = self.blob_path(sha256)
+        with _file_lock(blob):
+            blob.unlink(missing_ok=True)
+
+    def record(
+        self, url: str, title: str, filename: str, validators: Optional[dict] = None
+    ) -> None:
+        """
+        Record a successful download.
+
+        validators holds the response's cache validators ("etag", "last_modified"),
+        its "content_length", "sha256" and "source", as returned by
+        _fetch_with_fallbacks.
+        """
+        entry = {
+            "url": url,
+            "title": title,
+            "timestamp": datetime.now().isoformat(),
+            **(validators or {}),
+        }
+        with self._lock:
+            self._records[filename] = entry
+            self._by_url[canonical_url(url)] = filename
+            self._pending[filename] = entry
+        self._checkpoint()
+
+    def get(self, filename: str) -> Optional[dict]:
+        """Return the record stored for a file, if any."""
+        with self._lock:
+            return self._records.get(filename)
+
+    def update(self, filename: str, fields: dict) -> None:
+        """Add fields to a file's record, creating the record if needed."""
+        with self._lock:
+            entry = {**self._records.get(filename, {}), **fields}
+            self._records[filename] = entry
+            self._pending[filename] = entry
+        self._checkpoint()
+
+    def page(self, page_url: str) -> Optional[dict]:
+        """Return the cached link list and validators for a dataset page."""
+        with self._lock:
+            return self._pages.get(page_url)
+
+    def record_page(self, page_url: str, entry: dict) -> None:
+        """Cache the links found on a dataset page ("links", "etag", ...)."""
+        entry = {**entry, "timestamp": datetime.now().isoformat()}
+        with self._lock:
+            self._pages[page_url] = entry
+            self._pending_pages[page_url] = entry
+        self._checkpoint()
+
+    def _checkpoint(self) -> None:
+        if time.monotonic() - self._last_flush >= self.checkpoint_interval:
+            self.flush()
+
+    def flush(self) -> None:
+        """Merge pending records into the manifest file on disk."""
+        with self._lock:
+            if not self._pending and not self._pending_pages:
+                return
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            with _interprocess_lock(self.data_dir / METADATA_LOCK_FILE):
+                if self._pending:
+                    records = _load_metadata(self.data_dir)
+                    records.update(self._pending)
+                    _save_metadata(self.data_dir, records)
+                    self._records = records
+                    self._by_url = self._index(records)
+                if self._pending_pages:
+                    pages = _load_metadata(self.data_dir, PAGES_FILE)
+                    pages.update(self._pending_pages)
+                    _save_metadata(self.data_dir, pages, PAGES_FILE)
+                    self._pages = pages
+            self._pending.clear()
+            self._pending_pages.clear()
+            self._last_flush = time.monotonic()
+
+
+class HostHealth:
+    """
+    Per-host failure counts and response times, with a circuit breaker.
+
+    After failure_threshold consecutive failures (connection errors, timeouts
+    or 5xx responses), a host's circuit opens: for the next cooldown seconds
+    its requests go straight to archive.org instead of waiting for the host to
+    time out. After the cooldown the circuit is half-open: a single request
+    probes the host while the others keep going to archive.org, until the
+    probe succeeds (closing the circuit) or fails (opening it for another
+    cooldown). A probe without an outcome is given up on after DEFAULT_TIMEOUT
+    seconds, and the next request probes again.
+
+    Request timeouts follow each host's smoothed response time (time from
+    sending the request, once a host slot is free, to the response headers):
+    LATENCY_TIMEOUT_FACTOR times it, at least MIN_TIMEOUT and at most the
+    caller's timeout.
+
+    With a data_dir, the state is read from its hosts.json and merged back
+    into it on save (or when used as a context manager, on exit), so an
+    outage seen by one run is remembered by the next.
+    """
+
+    def __init__(
+        self,
+        data_dir: Optional[Path] = None,
+        failure_threshold: int = DEFAULT_FAILURE_THRESHOLD,
+        cooldown: float = DEFAULT_COOLDOWN,
+    ) -> None:
+        self.data_dir = data_dir
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self._hosts = _load_metadata(data_dir, HOSTS_FILE) if data_dir else {}
+        self._changed: set[str] = set()
+        self._probes: dict[str, datetime] = {}
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> "HostHealth":
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.save()
+
+    def is_open(self, url: str) -> bool:
+        """
+        Return True if requests to the URL's host should skip it for now.
+
+        Once the cooldown has passed, the first caller gets False and probes the
+        host; the others get True until the probe's outcome is recorded.
+        """
+        host = urlparse(url).netloc
+        now = datetime.now()
+        with self._lock:
+            entry = self._hosts.get(host)
+            if not entry or not entry.get("open_until"):
+                return False
+            if now < datetime.fromisoformat(entry["open_until"]):
+                return True
+            if host in self._probes and now < self._probes[host]:
+                return True
+            self._probes[host] = now + timedelta(seconds=DEFAULT_TIMEOUT)
+            return False
+
+    def timeout(self, url: str, default: float = DEFAULT_TIMEOUT) -> float:
+        """Return the timeout for a request to the URL's host, at most default."""
+        with self._lock:
+            latency = self._hosts.get(urlparse(url).netloc, {}).get("latency")
+        if latency is None:
+            return default
+        return min(default, max(MIN_TIMEOUT, LATENCY_TIMEOUT_FACTOR * latency))
+
+    def record_success(self, url: str, latency: float) -> None:
+        """Close the host's circuit and fold latency into its response time."""
+        host = urlparse(url).netloc
+        with self._lock:
+            entry = self._hosts.get(host, {})
+            previous = entry.get("latency")
+            if previous is not None:
+                latency += (1 - LATENCY_SMOOTHING) * (previous - latency)
+            self._hosts[host] = {
+                "failures": 0,
+                "open_until": None,
+                "latency": latency,
+                "updated": datetime.now().isoformat(),
+            }
+            self._probes.pop(host, None)
+            self._changed.add(host)
+
+    def record_failure(self, url: str) -> None:
+        """Count a failure, opening the host's circuit at the threshold."""
+        host = urlparse(url).netloc
+        now = datetime.now()
+        with self._lock:
+            entry = dict(self._hosts.get(host, {}))
+            entry["failures"] = entry.get("failures", 0) + 1
+            if entry["failures"] >= self.failure_threshold:
+                open_until = now + timedelta(seconds=self.cooldown)
+                entry["open_until"] = open_until.isoformat()
+                logging.warning(
+                    f"{host} failed {entry['failures']} times in a row, "
+                    f"using archive.org until {open_until:%H:%M:%S}"
+                )
+            entry["updated"] = now.isoformat()
+            self._hosts[host] = entry
+            self._probes.pop(host, None)
+            self._changed.add(host)
+
+    def save(self) -> None:
+        """Merge the hosts changed since the last save into hosts.json."""
+        with self._lock:
+            if not self.data_dir or not self._changed:
+                return
+            self.data_dir.mkdir(parents=True, exist_ok=True)
+            with _interprocess_lock(self.data_dir / METADATA_LOCK_FILE):
+                hosts = _load_metadata(self.data_dir, HOSTS_FILE)
+                hosts.update({host: self._hosts[host] for host in self._changed})
+                _save_metadata(self.data_dir, hosts, HOSTS_FILE)
+                self._hosts = hosts
+            self._changed.clear()
+
+
+def _is_host_failure(error: requests.RequestException) -> bool:
+    """Return True for errors that suggest the host is down, not the resource."""
+    if isinstance(error, (requests.ConnectionError, requests.Timeout)):
+        return True
+    response = getattr(error, "response", None)
+    return response is not None and response.status_code >= 500
+
+
+def _open_manifest(
+    data_dir: Path, manifest: Optional[Manifest]
+) -> AbstractContextManager[Manifest]:
+    """Reuse the caller's manifest, or open one that is flushed on exit."""
+    return nullcontext(manifest) if manifest else Manifest(data_dir)
+
+
+def _conditional_headers(record: dict) -> dict[str, str]:
+    """Build If-None-Match / If-Modified-Since headers from a manifest record."""
+    headers = {}
+    if record.get("etag"):
+        headers["If-None-Match"] = record["etag"]
+    if record.get("last_modified"):
+        headers["If-Modified-Since"] = record["last_modified"]
+    return headers
 
 
 def find_tag(
@@ -87,80 +733,381 @@ def get_text(tag: Optional[Tag]) -> str:
     return tag.get_text(strip=True) if tag else "unknown"
 
 
-def fetch_file(url: str, filepath: Path, max_retries: int = 3) -> bool:
-    """Download a file from a URL with retries and a 30-second timeout."""
+def format_bytes(size: float) -> str:
+    """Return a human-readable byte count, e.g. '1.5 MB'."""
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            break
+        size /= 1024
+    return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+
+
+class DownloadVerificationError(Exception):
+    """A downloaded file does not match its expected size or hash."""
+
+
+def _backoff_delay(attempt: int) -> float:
+    """Return an exponential backoff delay, with full jitter, for a retry attempt."""
+    return random.uniform(0, min(BACKOFF_MAX, BACKOFF_BASE * 2**attempt))
+
+
+def partial_path(filepath: Path) -> Path:
+    """Return the path where a download is written before it is complete."""
+    return filepath.with_name(f"{filepath.name}.part")
+
+
+def _validator_path(filepath: Path) -> Path:
+    """Return where the validator of a download's partial file is kept."""
+    return filepath.with_name(f"{filepath.name}.part.validator")
+
+
+def _discard_partial(filepath: Path) -> None:
+    partial_path(filepath).unlink(missing_ok=True)
+    _validator_path(filepath).unlink(missing_ok=True)
+
+
+def _range_headers(filepath: Path) -> dict[str, str]:
+    """
+    Build headers asking for the rest of a partial download, if one is on disk.
+
+    The range is always conditional on the ETag or Last-Modified of the
+    response the partial file came from (saved next to it), so the server sends
+    the whole file again if it has changed since. A partial file whose
+    validator is unknown cannot be resumed safely and is discarded.
+    """
+    part_path = partial_path(filepath)
+    offset = part_path.stat().st_size if part_path.is_file() else 0
+    if not offset:
+        return {}
+    validator_path = _validator_path(filepath)
+    validator = validator_path.read_text().strip() if validator_path.is_file() else ""
+    if not validator:
+        logging.info(f"Discarding partial {filepath.name}: unknown version")
+        _discard_partial(filepath)
+        return {}
+    return {"Range": f"bytes={offset}-", "If-Range": validator}
+
+
+def _is_encoded(response: requests.Response) -> bool:
+    """Return True if the body is transfer-compressed, so byte counts differ."""
+    return response.headers.get("Content-Encoding", "identity") != "identity"
+
+
+def _resume_offset(response: requests.Response, part_path: Path) -> int:
+    """
+    Return the size of the partial file the response body continues.
+
+    This is 0 unless the server answered "206 Partial Content" for exactly the
+    range that is missing from the partial file.
+    """
+    if response.status_code != 206:
+        return 0
+    offset = part_path.stat().st_size if part_path.is_file() else 0
+    match = re.match(r"bytes (\d+)-", response.headers.get("Content-Range", ""))
+    if not offset or not match or int(match[1]) != offset or _is_encoded(response):
+        part_path.unlink(missing_ok=True)
+        raise DownloadVerificationError("Server returned an unusable partial response")
+    return offset
+
+
+def _expected_size(response: requests.Response) -> Optional[int]:
+    """Return the full size of the file announced by the response, if known."""
+    if _is_encoded(response):
+        return None
+    if response.status_code == 206:
+        total = response.headers.get("Content-Range", "").rpartition("/")[2]
+    else:
+        total = response.headers.get("Content-Length", "")
+    return int(total) if total.isdigit() else None
+
+
+def _stream_to_file(
+    response: requests.Response,
+    filepath: Path,
+    expected_sha256: Optional[str] = None,
+) -> tuple[int, str]:
+    """
+    Write a streamed response body to disk in fixed-size chunks.
+
+    The body goes to a ".part" file next to the target. A "206 Partial Content"
+    response is appended to the partial file left by an earlier attempt. Once
+    complete, the file is checked against the announced size and expected_sha256,
+    fsynced and renamed into place, so readers never see a half-written file.
+    An interrupted transfer keeps its ".part" file so it can be resumed.
+
+    Returns the size of the file and the SHA-256 of its content.
+    Raises DownloadVerificationError if the file fails either check.
+    """
+    part_path = partial_path(filepath)
+    offset = _resume_offset(response, part_path)
+    digest = hashlib.sha256()
+    if offset:
+        logging.info(f"Resuming {filepath.name} at {format_bytes(offset)}")
+        with part_path.open("rb") as f:
+            while chunk := f.read(CHUNK_SIZE):
+                digest.update(chunk)
+    else:
+        # Saved before any byte, so a partial file never outlives its version.
+        validator = response.headers.get("ETag") or response.headers.get(
+            "Last-Modified"
+        )
+        validator_path = _validator_path(filepath)
+        if validator:
+            validator_path.write_text(validator)
+        else:
+            validator_path.unlink(missing_ok=True)
+
+    start = time.perf_counter()
+    written = 0
+    with part_path.open("ab" if offset else "wb") as f:
+        for chunk in response.iter_content(CHUNK_SIZE):
+            f.write(chunk)
+            digest.update(chunk)
+            written += len(chunk)
+        f.flush()
+        os.fsync(f.fileno())
+
+    size = offset + written
+    expected_size = _expected_size(response)
+    if expected_size is not None and size != expected_size:
+        if size > expected_size:
+            part_path.unlink(missing_ok=True)
+        raise DownloadVerificationError(
+            f"{filepath.name}: got {size} of {expected_size} bytes"
+        )
+    sha256 = digest.hexdigest()
+    if expected_sha256 and sha256 != expected_sha256:
+        part_path.unlink(missing_ok=True)
+        raise DownloadVerificationError(f"{filepath.name}: SHA-256 mismatch")
+    part_path.replace(filepath)
+    _validator_path(filepath).unlink(missing_ok=True)
+
+    elapsed = max(time.perf_counter() - start, 1e-6)
+    logging.info(
+        f"Downloaded {filepath.name}: {format_bytes(written)} in {elapsed:.2f}s "
+        f"({format_bytes(written / elapsed)}/s)"
+    )
+    return size, sha256
+
+
+def fetch_file(
+    url: str,
+    filepath: Path,
+    max_retries: int = 3,
+    session: Optional[requests.Session] = None,
+) -> bool:
+    """
+    Download a file from a URL with retries and a 30-second timeout.
+
+    Retries back off exponentially with jitter and resume the partial file with
+    a Range request when the server supports it.
+    """
+    session = session or default_session()
     for attempt in range(max_retries):
         try:
             logging.info(f"Downloading {filepath.name} (attempt {attempt + 1})")
-            with requests.get(url, timeout=30, stream=True) as r:
+            headers = _range_headers(filepath)
+            with session.get(url, timeout=30, stream=True, headers=headers) as r:
                 r.raise_for_status()
-                filepath.write_bytes(r.content)
-            logging.info(f"Downloaded {filepath.name}")
+                _stream_to_file(r, filepath)
             return True
-        except requests.RequestException as e:
+        except (requests.RequestException, DownloadVerificationError) as e:
             logging.error(f"Attempt {attempt + 1} failed: {e}")
+            response = getattr(e, "response", None)
+            if response is not None and response.status_code == 416:
+                _discard_partial(filepath)
             if attempt < max_retries - 1:
-                time.sleep(2 + attempt)
+                time.sleep(_backoff_delay(attempt))
     return False
 
 
 def fetch_response_with_fallbacks(
-    url: str, *, stream: bool = False, timeout: int = 30
+    url: str,
+    *,
+    stream: bool = False,
+    timeout: float = DEFAULT_TIMEOUT,
+    limiter: Optional[HostLimiter] = None,
+    headers: Optional[dict[str, str]] = None,
+    session: Optional[requests.Session] = None,
+    events: Optional[EventLog] = None,
+    health: Optional[HostHealth] = None,
+    hold: Optional[ExitStack] = None,
 ) -> Optional[requests.Response]:
     """
     Fetch a URL and return a response.
 
     If the primary request fails, retry once via archive.org.
     Returns a "requests.Response" on success, or None if all attempts fail.
+    A conditional request (see "headers") may return a "304 Not Modified" response.
+    Requests go through the given session, or the shared default session.
+    The archive.org request is recorded as a "fallback" event in events.
+
+    With health, the primary host is skipped while its circuit is open, its
+    timeout adapts to its response times, and the outcome is recorded. URLs
+    that already point to archive.org keep the given timeout.
+
+    The host slot from limiter is released once the headers arrive, unless
+    hold is given: then the slot of the URL that answered is moved onto it, so
+    a streamed body is read before another request to that host starts.
     """
-    try:
-        response = requests.get(url, timeout=timeout, stream=stream)
-        response.raise_for_status()
-        return response
-    except requests.RequestException as e:
-        logging.warning(f"Primary fetch failed for {url}: {e}")
+    session = session or default_session()
+    # Links found on archived pages already point to archive.org, which has
+    # nothing to fall back to, so it is neither tracked nor given a shorter
+    # timeout.
+    tracked = health if not _is_archive(url) else None
+    if tracked and tracked.is_open(url):
+        logging.info(f"Circuit open for {urlparse(url).netloc}, skipping {url}")
+    else:
+        try:
+            with ExitStack() as slot:
+                slot.enter_context(_slot(limiter, url))
+                # Time the request only, not the wait for a host slot.
+                start = time.perf_counter()
+                response = session.get(
+                    url,
+                    timeout=tracked.timeout(url, timeout) if tracked else timeout,
+                    stream=stream,
+                    headers=headers,
+                )
+                latency = time.perf_counter() - start
+                response.raise_for_status()
+                if hold is not None:
+                    hold.enter_context(slot.pop_all())
+            if tracked:
+                tracked.record_success(url, latency)
+            return response
+        except requests.RequestException as e:
+            logging.warning(f"Primary fetch failed for {url}: {e}")
+            if tracked and _is_host_failure(e):
+                tracked.record_failure(url)
 
     archive_url = f"https://web.archive.org/web/0/{url}"
     logging.info(f"Trying archive.org fallback: {archive_url}")
-    try:
-        response = requests.get(archive_url, timeout=timeout, stream=stream)
-        response.raise_for_status()
-        return response
-    except requests.RequestException as e:
-        logging.error(f"Archive.org fallback failed: {e}")
-        return None
+    with _record(events, "fallback", archive_url, source="archive") as event:
+        try:
+            with ExitStack() as slot:
+                slot.enter_context(_slot(limiter, archive_url))
+                response = session.get(
+                    archive_url, timeout=timeout, stream=stream, headers=headers
+                )
+                event.status = response.status_code
+                response.raise_for_status()
+                if hold is not None:
+                    hold.enter_context(slot.pop_all())
+            return response
+        except requests.RequestException as e:
+            logging.error(f"Archive.org fallback failed: {e}")
+            event.error = str(e)
+            return None
 
 
-def _fetch_with_fallbacks(url: str, filepath: Path) -> bool:
-    """Download a file from a URL, retrying via archive.org if necessary."""
-    response = fetch_response_with_fallbacks(url, stream=True)
-    if not response:
-        return False
-    try:
-        filepath.write_bytes(response.content)
-        logging.info(f"Downloaded {filepath.name}")
-        return True
-    except OSError as e:
-        logging.error(f"Failed to save {filepath}: {e}")
-        return False
+def _fetch_with_fallbacks(
+    url: str,
+    filepath: Path,
+    limiter: Optional[HostLimiter] = None,
+    cached: Optional[dict] = None,
+    max_retries: int = 3,
+    session: Optional[requests.Session] = None,
+    events: Optional[EventLog] = None,
+    health: Optional[HostHealth] = None,
+) -> Optional[dict]:
+    """
+    Download a file from a URL, retrying via archive.org if necessary.
 
+    If a cached manifest record is given, the request is made conditional on its
+    validators and the body is skipped when the server answers "304 Not Modified".
+    A transfer that breaks off is retried with exponential backoff, resuming from
+    the partial file where the server supports Range requests.
 
-def extract_csv_links(page_url: str) -> list[dict[str, str]]:
+    Returns the HTTP "status" and the "url" that answered (the archive.org one
+    after a fallback) with the fields to store in the manifest ("source",
+    "etag", "last_modified", "content_length", "sha256"), or None if the
+    download failed.
     """
-    Extract CSV download links from a datosabiertos.gob.pe dataset page.
+    part_path = partial_path(filepath)
+    for attempt in range(max_retries):
+        headers = {
+            **(_conditional_headers(cached) if cached else {}),
+            **_range_headers(filepath),
+        }
+        resuming = part_path.is_file()
+        # One host slot covers the request and the body read, so a worker
+        # never waits for a second slot while its response is already open.
+        with ExitStack() as slot:
+            response = fetch_response_with_fallbacks(
+                url,
+                stream=True,
+                limiter=limiter,
+                headers=headers or None,
+                session=session,
+                events=events,
+                health=health,
+                hold=slot,
+            )
+            if not response:
+                if not resuming:
+                    return None
+                # The range may have been refused (e.g. 416), so start over once.
+                _discard_partial(filepath)
+                continue
+
+            source = _response_source(response)
+            if response.status_code == 304:
+                response.close()
+                logging.info(f"Not modified: {filepath.name}")
+                return {"status": 304, "url": response.url, "source": source}
+
+            etag = response.headers.get("ETag")
+            last_modified = response.headers.get("Last-Modified")
+            # Same ETag as the cached copy means the content must hash the same.
+            same_version = cached and etag and etag == cached.get("etag")
+            expected_sha256 = cached.get("sha256") if same_version else None
+
+            try:
+                with response:
+                    size, sha256 = _stream_to_file(response, filepath, expected_sha256)
+            except (
+                OSError,
+                requests.RequestException,
+                DownloadVerificationError,
+            ) as e:
+                logging.error(
+                    f"Failed to save {filepath.name} (attempt {attempt + 1}): {e}"
+                )
+                # Give the slot back before backing off.
+                slot.close()
+                if attempt < max_retries - 1:
+                    time.sleep(_backoff_delay(attempt))
+                continue
+
+        return {
+            "status": response.status_code,
+            "url": response.url,
+            "source": source,
+            "etag": etag,
+            "last_modified": last_modified,
+            "content_length": size,
+            "sha256": sha256,
+        }
+    return None
+
+
+def parse_csv_links(html: Union[str, bytes], page_url: str) -> list[dict[str, str]]:
+    """
+    Parse the CSV download links out of a datosabiertos.gob.pe dataset page.
+
+    Only the "#data-and-resources" section is turned into a tree, which skips
+    most of the page.
 
     Args:
-        page_url: Dataset page URL.
+        html: Page content.
+        page_url: URL the page was served from, used to detect archive.org copies.
 
     Returns:
         A list of dictionaries with 'title' and 'url' keys for each CSV found.
     """
-    response = fetch_response_with_fallbacks(page_url)
-    if not response:
-        logging.error(f"Failed to fetch page: {page_url}")
-        return []
-
-    soup = BeautifulSoup(response.content, "html.parser")
+    strainer = SoupStrainer("div", id="data-and-resources")
+    soup = BeautifulSoup(html, "html.parser", parse_only=strainer)
     resources_div = find_tag(soup, "div", id_="data-and-resources")
     if not resources_div:
         logging.warning("No resource section found")
@@ -186,11 +1133,98 @@ def extract_csv_links(page_url: str) -> list[dict[str, str]]:
         if "csv" in file_format or url.lower().endswith(".csv"):
             if url.startswith("/"):
                 url = urljoin("https://datosabiertos.gob.pe", url)
-            if "web.archive.org" in response.url and "web.archive.org" not in url:
+            if "web.archive.org" in page_url and "web.archive.org" not in url:
                 url = f"https://web.archive.org/web/0/{url}"
             links.append({"title": title, "url": url})
 
-    logging.info(f"Found {len(links)} CSV links")
+    return links
+
+
+def _page_is_fresh(entry: dict, max_age: float) -> bool:
+    """Return True if a cached page entry is younger than max_age seconds."""
+    try:
+        checked = datetime.fromisoformat(entry["timestamp"])
+    except (KeyError, ValueError):
+        return False
+    return (datetime.now() - checked).total_seconds() < max_age
+
+
+def extract_csv_links(
+    page_url: str,
+    limiter: Optional[HostLimiter] = None,
+    session: Optional[requests.Session] = None,
+    manifest: Optional[Manifest] = None,
+    max_age: float = DEFAULT_PAGE_MAX_AGE,
+    events: Optional[EventLog] = None,
+    health: Optional[HostHealth] = None,
+) -> list[dict[str, str]]:
+    """
+    Extract CSV download links from a datosabiertos.gob.pe dataset page.
+
+    With a manifest, the links are cached per page. A cached page younger than
+    max_age is used without any request; an older one is revalidated with a
+    conditional request and only downloaded and parsed again if it changed.
+
+    Args:
+        page_url: Dataset page URL.
+        limiter: Optional per-host bound on in-flight requests.
+        session: HTTP session to use; defaults to the shared session.
+        manifest: Manifest holding the page cache; without it, nothing is cached.
+        max_age: Seconds a cached page is trusted without revalidation.
+        events: Where to record the "cache", "page" and "links" events.
+        health: Host health to consult and update (see HostHealth).
+
+    Returns:
+        A list of dictionaries with 'title' and 'url' keys for each CSV found.
+    """
+    cached = manifest.page(page_url) if manifest else None
+    with _record(events, "cache", page_url) as event:
+        fresh = bool(cached) and _page_is_fresh(cached, max_age)
+        event.cache = "hit" if fresh else "stale" if cached else "miss"
+    if fresh:
+        logging.info(f"Page cache hit: {len(cached['links'])} CSV links")
+        return cached["links"]
+
+    with _record(events, "page", page_url) as event:
+        response = fetch_response_with_fallbacks(
+            page_url,
+            limiter=limiter,
+            session=session,
+            headers=_conditional_headers(cached) if cached else None,
+            events=events,
+            health=health,
+        )
+        if response:
+            event.url = response.url
+            event.status = response.status_code
+            event.source = _response_source(response)
+            event.bytes = len(response.content)
+            if response.status_code == 304:
+                event.cache = "not_modified"
+        else:
+            event.error = "page not available"
+    if not response:
+        logging.error(f"Failed to fetch page: {page_url}")
+        return []
+
+    if cached and response.status_code == 304:
+        links = cached["links"]
+        logging.info(f"Page not modified: {len(links)} CSV links")
+    else:
+        with _record(events, "links", response.url, bytes=len(response.content)):
+            links = parse_csv_links(response.content, response.url)
+        logging.info(f"Found {len(links)} CSV links")
+
+    if manifest:
+        manifest.record_page(
+            page_url,
+            {
+                "etag": response.headers.get("ETag") or (cached or {}).get("etag"),
+                "last_modified": response.headers.get("Last-Modified")
+                or (cached or {}).get("last_modified"),
+                "links": links,
+            },
+        )
     return links
 
 
@@ -203,8 +1237,87 @@ def sanitize_filename(title: str, url: str) -> str:
     return re.sub(r"[^\w\-.]", "_", name)
 
 
+def _download_resource(
+    url: str,
+    title: str,
+    filename: str,
+    manifest: Manifest,
+    force: bool,
+    revalidate: bool = False,
+    limiter: Optional[HostLimiter] = None,
+    session: Optional[requests.Session] = None,
+    events: Optional[EventLog] = None,
+    health: Optional[HostHealth] = None,
+) -> Optional[Path]:
+    """
+    Return a cached file for the URL, or download it and record it.
+
+    With revalidate, a cached file is kept only if the server confirms it is
+    unchanged; otherwise the new content replaces it.
+    """
+    filepath = manifest.data_dir / filename
+
+    # Workers that reach the same file wait here, then find it in the cache.
+    with _file_lock(filepath):
+        with _record(events, "cache", url) as event:
+            cached = None if force else manifest.find(url)
+            event.cache = "miss" if not cached else "stale" if revalidate else "hit"
+            if cached:
+                event.bytes = cached[0].stat().st_size
+        if cached and not revalidate:
+            logging.info(f"Cache hit: {cached[0].name}")
+            return cached[0]
+
+        if cached:
+            filepath = cached[0]
+        with _record(events, "download", url) as event:
+            result = _fetch_with_fallbacks(
+                url,
+                filepath,
+                limiter,
+                cached=cached[1] if cached else None,
+                session=session,
+                events=events,
+                health=health,
+            )
+            if result:
+                # Charge the transfer to the host that served it.
+                event.url = result.pop("url")
+                event.status = result["status"]
+                event.source = result["source"]
+                event.bytes = result.get("content_length") or 0
+                if result["status"] == 304:
+                    event.cache = "not_modified"
+            else:
+                event.error = "download failed"
+        if result and result.pop("status") == 304:
+            return filepath
+        if result:
+            previous = (manifest.get(filepath.name) or {}).get("sha256")
+            manifest.record(url, title, filepath.name, result)
+            manifest.store(filepath, result["sha256"])
+            if previous and previous != result["sha256"]:
+                manifest.release(previous)
+            return filepath
+        if filepath.exists():
+            logging.info(f"Using existing file: {filename}")
+            return filepath
+        return None
+
+
 def download_page_csvs(
-    page_url: str, data_dir: Path, force: bool = False
+    page_url: str,
+    data_dir: Path,
+    force: bool = False,
+    *,
+    revalidate: bool = False,
+    executor: Optional[Executor] = None,
+    limiter: Optional[HostLimiter] = None,
+    manifest: Optional[Manifest] = None,
+    session: Optional[requests.Session] = None,
+    page_max_age: float = DEFAULT_PAGE_MAX_AGE,
+    events: Optional[EventLog] = None,
+    health: Optional[HostHealth] = None,
 ) -> list[Path]:
     """
     Download all CSV files linked on a datosabiertos.gob.pe dataset page.
@@ -213,41 +1326,74 @@ def download_page_csvs(
         page_url: Dataset page URL.
         data_dir: Directory where files are saved.
         force: If True, re-download even if cached.
+        revalidate: If True, check cached files with a conditional request and
+            re-download only those that changed on the server.
+        executor: If given, CSV files are fetched concurrently on it.
+        limiter: Optional per-host bound on in-flight requests.
+        manifest: Open manifest to use; by default data_dir's manifest is
+            loaded and flushed when done.
+        session: HTTP session to use; defaults to the shared session.
+        page_max_age: Seconds the cached link list of the page is used without
+            asking the server; force and revalidate always ask.
+        events: Where to record timing events (see EventLog).
+        health: Host health to consult and update (see HostHealth).
 
     Returns:
-        A list of downloaded or cached file paths.
+        A list of downloaded or cached file paths, in page order.
     """
     data_dir.mkdir(parents=True, exist_ok=True)
-    links = extract_csv_links(page_url)
-    if not links:
-        logging.warning(f"No CSV files found on {page_url}")
-        return []
 
-    downloaded: list[Path] = []
-    for link in links:
-        url = link["url"]
-        title = link["title"]
+    with _open_manifest(data_dir, manifest) as m:
+        max_age = 0 if force or revalidate else page_max_age
+        links = extract_csv_links(
+            page_url, limiter, session, m, max_age, events, health
+        )
+        if not links:
+            logging.warning(f"No CSV files found on {page_url}")
+            return []
 
-        if not force:
-            cached = _find_cached_file(data_dir, url)
-            if cached:
-                downloaded.append(cached)
-                continue
+        def fetch(link: dict[str, str]) -> Optional[Path]:
+            url = link["url"]
+            title = link["title"]
+            filename = sanitize_filename(title, url)
+            return _download_resource(
+                url,
+                title,
+                filename,
+                m,
+                force,
+                revalidate,
+                limiter,
+                session,
+                events,
+                health,
+            )
 
-        filename = sanitize_filename(title, url)
-        filepath = data_dir / filename
+        return [path for path in _map_ordered(executor, fetch, links) if path]
 
-        if _fetch_with_fallbacks(url, filepath):
-            _record_download(data_dir, url, title, filename)
-            downloaded.append(filepath)
-        elif filepath.exists():
-            logging.info(f"Using existing file: {filename}")
-            downloaded.append(filepath)
 
-    return downloaded
+def _csv_filename(url: str) -> str:
+    """Return the filename a direct CSV URL is saved under."""
+    filename = Path(urlparse(url).path).name.replace("%20", "_").replace(" ", "_")
+    if not filename.endswith(".csv"):
+        url_hash = hashlib.sha256(canonical_url(url).encode()).hexdigest()
+        filename = f"data_{url_hash[:16]}.csv"
+    return filename
 
 
-def download_csvs(urls: list[str], data_dir: Path, force: bool = False) -> list[Path]:
+def download_csvs(
+    urls: list[str],
+    data_dir: Path,
+    force: bool = False,
+    *,
+    revalidate: bool = False,
+    executor: Optional[Executor] = None,
+    limiter: Optional[HostLimiter] = None,
+    manifest: Optional[Manifest] = None,
+    session: Optional[requests.Session] = None,
+    events: Optional[EventLog] = None,
+    health: Optional[HostHealth] = None,
+) -> list[Path]:
     """
     Download CSV files directly from URLs.
 
@@ -255,62 +1401,578 @@ def download_csvs(urls: list[str], data_dir: Path, force: bool = False) -> list[
         urls: List of direct CSV URLs.
         data_dir: Directory where files are saved.
         force: If True, re-download even if cached.
+        revalidate: If True, check cached files with a conditional request and
+            re-download only those that changed on the server.
+        executor: If given, CSV files are fetched concurrently on it.
+        limiter: Optional per-host bound on in-flight requests.
+        manifest: Open manifest to use; by default data_dir's manifest is
+            loaded and flushed when done.
+        session: HTTP session to use; defaults to the shared session.
+        events: Where to record timing events (see EventLog).
+        health: Host health to consult and update (see HostHealth).
 
     Returns:
-        A list of downloaded or cached file paths.
+        A list of downloaded or cached file paths, in input order.
     """
     data_dir.mkdir(parents=True, exist_ok=True)
-    downloaded: list[Path] = []
 
-    for url in urls:
-        if not force:
-            cached = _find_cached_file(data_dir, url)
-            if cached:
-                downloaded.append(cached)
-                continue
+    with _open_manifest(data_dir, manifest) as m:
 
-        filename = Path(urlparse(url).path).name.replace("%20", "_").replace(" ", "_")
-        if not filename.endswith(".csv"):
-            filename = f"data_{hash(url) % 10000}.csv"
-        filepath = data_dir / filename
+        def fetch(url: str) -> Optional[Path]:
+            filename = _csv_filename(url)
+            return _download_resource(
+                url,
+                filename,
+                filename,
+                m,
+                force,
+                revalidate,
+                limiter,
+                session,
+                events,
+                health,
+            )
 
-        if _fetch_with_fallbacks(url, filepath):
-            _record_download(data_dir, url, filename, filename)
-            downloaded.append(filepath)
-        elif filepath.exists():
-            logging.info(f"Using existing file: {filename}")
-            downloaded.append(filepath)
-
-    return downloaded
+        return [path for path in _map_ordered(executor, fetch, urls) if path]
 
 
 def download(
-    url: Union[str, list[str]], data_dir: Path, force: bool = False
+    url: Union[str, list[str]],
+    data_dir: Path,
+    force: bool = False,
+    *,
+    revalidate: bool = False,
+    max_workers: int = 1,
+    max_per_host: int = DEFAULT_MAX_PER_HOST,
+    checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+    session: Optional[requests.Session] = None,
+    page_max_age: float = DEFAULT_PAGE_MAX_AGE,
+    events: Optional[EventLog] = None,
+    health: Optional[HostHealth] = None,
 ) -> list[Path]:
     """
     Download CSVs from one or more URLs.
 
     Supports both direct CSV links and datosabiertos.gob.pe dataset pages.
     Automatically falls back to archive.org if the primary source is unavailable,
-    and uses cached files when possible.
+    and uses cached files and page links when possible (see Manifest).
 
     Args:
         url: Single URL string or list of URLs.
         data_dir: Directory where files and metadata are stored.
         force: If True, re-download even if cached.
+        revalidate: If True, check cached files with conditional requests
+            (ETag / Last-Modified) and re-download only those that changed.
+        max_workers: Number of concurrent workers; 1 downloads serially.
+        max_per_host: Maximum in-flight requests per host in concurrent mode.
+        checkpoint_interval: Seconds between intermediate manifest writes.
+        session: HTTP session to use, e.g. one from create_session with larger
+            pools or custom adapters; defaults to the shared session.
+        page_max_age: Seconds a dataset page's cached links are used without
+            asking the server.
+        events: Where to record timing events (see EventLog); a new one by
+            default. Its summary is logged when the call ends.
+        health: Host health to use (see HostHealth); by default data_dir's,
+            saved when done.
 
     Returns:
-        A list of downloaded or cached file paths.
+        A list of downloaded or cached file paths, in input order and without
+        duplicates.
     """
     url_list = [url] if isinstance(url, str) else url
-    all_files: list[Path] = []
+    data_dir.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(data_dir, checkpoint_interval)
+    events = events if events is not None else EventLog()
+    health = health or HostHealth(data_dir)
+    start = time.perf_counter()
 
-    for u in url_list:
-        files = (
-            download_csvs([u], data_dir, force)
-            if u.lower().endswith(".csv")
-            else download_page_csvs(u, data_dir, force)
+    def fetch(
+        u: str,
+        executor: Optional[Executor] = None,
+        limiter: Optional[HostLimiter] = None,
+    ) -> list[Path]:
+        if u.lower().endswith(".csv"):
+            return download_csvs(
+                [u],
+                data_dir,
+                force,
+                revalidate=revalidate,
+                executor=executor,
+                limiter=limiter,
+                manifest=manifest,
+                session=session,
+                events=events,
+                health=health,
+            )
+        return download_page_csvs(
+            u,
+            data_dir,
+            force,
+            revalidate=revalidate,
+            executor=executor,
+            limiter=limiter,
+            manifest=manifest,
+            session=session,
+            page_max_age=page_max_age,
+            events=events,
+            health=health,
         )
-        all_files.extend(files)
 
-    return list(set(all_files))
+    with manifest, health:
+        if max_workers <= 1:
+            results = [fetch(u) for u in url_list]
+        else:
+            limiter = HostLimiter(max_per_host)
+            # Pages and files run on separate pools so a page waiting on its files
+            # can never starve the workers those files need.
+            with (
+                ThreadPoolExecutor(max_workers) as page_pool,
+                ThreadPoolExecutor(max_workers) as file_pool,
+            ):
+                results = list(
+                    page_pool.map(lambda u: fetch(u, file_pool, limiter), url_list)
+                )
+
+    all_files = list(dict.fromkeys(path for files in results for path in files))
+    logging.info(
+        format_summary(events.summary(), len(all_files), time.perf_counter() - start)
+    )
+    return all_files
+
+
+async def download_async(
+    url: Union[str, list[str]],
+    data_dir: Path,
+    force: bool = False,
+    *,
+    revalidate: bool = False,
+    max_per_host: int = DEFAULT_MAX_PER_HOST,
+    checkpoint_interval: float = DEFAULT_CHECKPOINT_INTERVAL,
+    session: Optional[requests.Session] = None,
+    page_max_age: float = DEFAULT_PAGE_MAX_AGE,
+    events: Optional[EventLog] = None,
+    health: Optional[HostHealth] = None,
+    on_event: Optional[Callable[[Event], None]] = None,
+) -> list[Path]:
+    """
+    Download CSVs from one or more URLs without blocking the event loop.
+
+    Same behaviour and arguments as download(): cached files, archive.org
+    fallbacks, the manifest, the page cache and host health all work the same
+    way. Every page and file is fetched as its own task, with at most
+    max_per_host in flight per host. The blocking requests run in the loop's
+    default thread pool (asyncio.to_thread), so a marimo cell can await this
+    while the kernel keeps serving other cells, and several datasets can be
+    downloaded at once with asyncio.gather.
+
+    Args:
+        on_event: Called on the event loop with every Event as soon as its step
+            ends, e.g. to update a progress bar.
+
+    Returns:
+        A list of downloaded or cached file paths, in input order and without
+        duplicates.
+    """
+    url_list = [url] if isinstance(url, str) else url
+    data_dir.mkdir(parents=True, exist_ok=True)
+    manifest = Manifest(data_dir, checkpoint_interval)
+    events = events if events is not None else EventLog()
+    health = health or HostHealth(data_dir)
+    max_age = 0 if force or revalidate else page_max_age
+    slots = AsyncHostLimiter(max_per_host)
+    # Also bounds the archive.org fallbacks, which happen inside the threads.
+    limiter = HostLimiter(max_per_host)
+    start = time.perf_counter()
+
+    loop = asyncio.get_running_loop()
+
+    def forward(event: Event) -> None:
+        loop.call_soon_threadsafe(on_event, event)
+
+    if on_event:
+        events.callbacks.append(forward)
+
+    async def fetch_resource(
+        file_url: str, title: str, filename: str
+    ) -> Optional[Path]:
+        async with slots.slot(file_url):
+            return await asyncio.to_thread(
+                _download_resource,
+                file_url,
+                title,
+                filename,
+                manifest,
+                force,
+                revalidate,
+                limiter,
+                session,
+                events,
+                health,
+            )
+
+    async def fetch(u: str) -> list[Path]:
+        if u.lower().endswith(".csv"):
+            filename = _csv_filename(u)
+            resources = [(u, filename, filename)]
+        else:
+            async with slots.slot(u):
+                links = await asyncio.to_thread(
+                    extract_csv_links,
+                    u,
+                    limiter,
+                    session,
+                    manifest,
+                    max_age,
+                    events,
+                    health,
+                )
+            if not links:
+                logging.warning(f"No CSV files found on {u}")
+            resources = [
+                (
+                    link["url"],
+                    link["title"],
+                    sanitize_filename(link["title"], link["url"]),
+                )
+                for link in links
+            ]
+        paths = await asyncio.gather(*(fetch_resource(*r) for r in resources))
+        return [path for path in paths if path]
+
+    try:
+        results = await asyncio.gather(*(fetch(u) for u in url_list))
+    finally:
+        await asyncio.to_thread(manifest.flush)
+        await asyncio.to_thread(health.save)
+        if on_event:
+            events.callbacks.remove(forward)
+
+    all_files = list(dict.fromkeys(path for files in results for path in files))
+    logging.info(
+        format_summary(events.summary(), len(all_files), time.perf_counter() - start)
+    )
+    return all_files
+
+
+def format_summary(summary: dict, n_files: int, elapsed: float) -> str:
+    """Describe an EventLog summary in one line for the log."""
+    stages, cache = summary["stages"], summary["cache"]
+    parts = [
+        f"Downloaded {n_files} files in {elapsed:.2f}s",
+        f"{stages['download']['count']} transfers "
+        f"({format_bytes(stages['download']['bytes'])})",
+    ]
+    if cache["hit_rate"] is not None:
+        parts.append(f"cache hit rate {cache['hit_rate']:.0%}")
+    if summary["sources"].get("archive"):
+        parts.append(f"{summary['sources']['archive']} from archive.org")
+    if summary["errors"]:
+        parts.append(f"{summary['errors']} errors")
+    if summary["hosts"]:
+        host, entry = next(iter(summary["hosts"].items()))
+        parts.append(f"slowest host {host} ({entry['seconds']:.2f}s)")
+    return ", ".join(parts)
+
+
+@dataclass(frozen=True)
+class DatasetSpec:
+    """
+    How to read one SINIA dataset.
+
+    Column names are normalized with normalize_column() before the declared
+    dtypes are applied, so "columns" uses normalized names. Columns that are
+    not declared are read as text, without an inference pass over the file.
+
+    Columns in "numeric_text" hold numbers written with stray characters
+    (units, thousands separators); they are read as text, stripped of
+    everything but digits and the decimal point, and cast to their declared
+    dtype, so the Parquet copy stores them as numbers.
+    """
+
+    name: str
+    pattern: str
+    columns: dict[str, type[pl.DataType]] = field(default_factory=dict)
+    encoding: str = "latin1"
+    separator: str = ";"
+    numeric_text: tuple[str, ...] = ()
+
+    def matches(self, filename: str) -> bool:
+        return re.search(self.pattern, filename, re.IGNORECASE) is not None
+
+    def fingerprint(self) -> str:
+        """Return a key that changes whenever the way the file is read changes."""
+        declared = {name: str(dtype) for name, dtype in sorted(self.columns.items())}
+        key = [
+            self.name,
+            self.encoding,
+            self.separator,
+            declared,
+            sorted(self.numeric_text),
+        ]
+        return hashlib.sha256(json.dumps(key).encode()).hexdigest()[:16]
+
+
+# Geographic names are always read as text and UBIGEO codes keep their leading
+# zeros.
+_LOCATION_COLUMNS = {
+    "UBIGEO": pl.String,
+    "DEPARTAMENTO": pl.String,
+    "PROVINCIA": pl.String,
+    "DISTRITO": pl.String,
+}
+
+DATASETS: dict[str, DatasetSpec] = {
+    spec.name: spec
+    for spec in [
+        DatasetSpec(
+            name="generacion_residuos",
+            pattern=r"generacion_anual",
+            columns={
+                **_LOCATION_COLUMNS,
+                "ANIO": pl.Int64,
+                "GENERACION_MUN_TANIO": pl.Float64,
+                "POB_TOTAL_INEI": pl.Float64,
+            },
+        ),
+        DatasetSpec(
+            name="valorizacion_inorganica",
+            pattern=r"inorg",
+            columns={**_LOCATION_COLUMNS, "QRESIDUOS__VAL_INORGAN": pl.Float64},
+            numeric_text=("QRESIDUOS__VAL_INORGAN",),
+        ),
+        DatasetSpec(
+            name="valorizacion_organica",
+            # "Inorgánicos" also contains "org"
+            pattern=r"(?<!in)org",
+            columns=_LOCATION_COLUMNS,
+        ),
+    ]
+}
+
+
+def dataset_spec(filename: str) -> Optional[DatasetSpec]:
+    """Return the registered spec whose pattern matches a file name, if any."""
+    return next((spec for spec in DATASETS.values() if spec.matches(filename)), None)
+
+
+def find_dataset_file(name: str, paths: Iterable[Path]) -> Optional[Path]:
+    """Return the first downloaded file belonging to a registered dataset."""
+    spec = DATASETS[name]
+    return next((path for path in paths if spec.matches(path.name)), None)
+
+
+_ACCENTS = str.maketrans("ÁÉÍÓÚ", "AEIOU")
+
+
+def normalize_column(name: str) -> str:
+    """Normalize a column name to upper case without BOM, accents or spaces."""
+    name = name.replace("ï»¿", "").replace("Ï»¿", "").replace("\ufeff", "")
+    return name.strip().upper().replace(" ", "_").translate(_ACCENTS)
+
+
+def _read_header(path: Path, encoding: str, separator: str) -> list[str]:
+    with path.open(encoding=encoding, newline="") as f:
+        return next(csv.reader(f, delimiter=separator), [])
+
+
+def read_dataset(path: Path, spec: Optional[DatasetSpec] = None) -> pl.DataFrame:
+    """
+    Read a SINIA CSV in a single parse with normalized names and declared dtypes.
+
+    Only the header line is read up front to work out the normalized names; the
+    file is then parsed once with those names and the spec's dtypes, so no
+    rename or cast is needed afterwards. Undeclared columns are read as text.
+
+    Args:
+        path: CSV file returned by download().
+        spec: How to read the file. Looked up in DATASETS by file name if None.
+
+    Returns:
+        The parsed dataframe.
+    """
+    spec = spec or dataset_spec(path.name) or DatasetSpec(path.stem, pattern="")
+    names = [
+        normalize_column(c) for c in _read_header(path, spec.encoding, spec.separator)
+    ]
+    missing = sorted(set(spec.columns) - set(names) - set(_LOCATION_COLUMNS))
+    if missing:
+        logging.warning(f"{path.name}: declared columns not found: {missing}")
+
+    numeric_text = [name for name in spec.numeric_text if name in names]
+    df = pl.read_csv(
+        path,
+        encoding=spec.encoding,
+        separator=spec.separator,
+        new_columns=names,
+        schema_overrides={
+            name: pl.String if name in numeric_text else dtype
+            for name, dtype in spec.columns.items()
+            if name in names
+        },
+        truncate_ragged_lines=True,
+        infer_schema=False,
+    )
+    return df.with_columns(
+        pl.col(name)
+        .str.replace_all(r"[^\d.]", "")
+        .cast(spec.columns.get(name, pl.Float64), strict=False)
+        for name in numeric_text
+    )
+
+
+def file_sha256(path: Path) -> str:
+    """Return the SHA-256 of a file, read in fixed-size chunks."""
+    digest = hashlib.sha256()
+    with path.open("rb") as f:
+        while chunk := f.read(CHUNK_SIZE):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _ingest_csv(csv_path: Path, manifest: Manifest, force: bool) -> Path:
+    """Convert one CSV to Parquet unless an up-to-date conversion exists."""
+    record = manifest.get(csv_path.name) or {}
+    source_sha256 = record.get("sha256") or file_sha256(csv_path)
+    parquet_path = csv_path.with_suffix(".parquet")
+    converted = record.get("parquet") or {}
+    spec = dataset_spec(csv_path.name) or DatasetSpec(csv_path.stem, pattern="")
+
+    if (
+        not force
+        and converted.get("source_sha256") == source_sha256
+        and converted.get("schema") == spec.fingerprint()
+        and parquet_path.is_file()
+    ):
+        logging.info(f"Parquet cache hit: {parquet_path.name}")
+        return parquet_path
+
+    start = time.perf_counter()
+    df = read_dataset(csv_path, spec)
+    part_path = partial_path(parquet_path)
+    df.write_parquet(part_path, compression=PARQUET_COMPRESSION)
+    part_path.replace(parquet_path)
+    logging.info(
+        f"Converted {csv_path.name} to Parquet: {df.height:,} rows, "
+        f"{format_bytes(csv_path.stat().st_size)} -> "
+        f"{format_bytes(parquet_path.stat().st_size)} "
+        f"in {time.perf_counter() - start:.2f}s"
+    )
+
+    manifest.update(
+        csv_path.name,
+        {
+            "sha256": source_sha256,
+            "parquet": {
+                "file": parquet_path.name,
+                "source_sha256": source_sha256,
+                "schema": spec.fingerprint(),
+                "rows": df.height,
+            },
+        },
+    )
+    return parquet_path
+
+
+def ingest(
+    paths: Union[Path, list[Path]], data_dir: Path, force: bool = False
+) -> list[Path]:
+    """
+    Convert downloaded SINIA CSVs into typed, compressed Parquet files.
+
+    Each CSV is parsed once with read_dataset() (normalized column names and
+    the dtypes declared in DATASETS) and written next to it as a
+    zstd-compressed ".parquet" file. The conversion is recorded in the manifest
+    under the source file's SHA-256 and the spec's fingerprint, so it is only
+    redone when the CSV or its declared schema changes. Load the result with
+    "pl.scan_parquet" to read only the columns and rows a query needs.
+
+    Args:
+        paths: CSV file or files returned by download().
+        data_dir: Directory holding the files and the manifest.
+        force: If True, convert again even if an up-to-date Parquet file exists.
+
+    Returns:
+        The Parquet file paths, in the same order as the CSV paths.
+    """
+    path_list = [paths] if isinstance(paths, Path) else paths
+    with Manifest(data_dir) as manifest:
+        return [_ingest_csv(path, manifest, force) for path in path_list]
+
+
+def _rollup_frame(
+    df: pl.LazyFrame, levels: list[str], measures: list[str]
+) -> pl.LazyFrame:
+    """Sum measures at every prefix of levels (a GROUP BY ROLLUP without the total)."""
+    frames = []
+    for depth in range(1, len(levels) + 1):
+        keys = levels[:depth]
+        frames.append(
+            df.group_by(keys)
+            .agg(*(pl.col(m).sum() for m in measures), pl.len().alias("ROWS"))
+            .with_columns(
+                *(pl.lit(None, dtype=pl.String).alias(k) for k in levels[depth:]),
+                pl.lit(keys[-1]).alias("LEVEL"),
+            )
+            .select("LEVEL", *levels, *measures, "ROWS")
+        )
+    return pl.concat(frames, how="vertical_relaxed").sort(levels)
+
+
+def rollup(
+    csv_path: Path,
+    data_dir: Path,
+    levels: list[str],
+    measures: list[str],
+    force: bool = False,
+) -> pl.DataFrame:
+    """
+    Return pre-aggregated totals of a dataset at every level of a hierarchy.
+
+    For levels ["ANIO", "DEPARTAMENTO", "PROVINCIA", "DISTRITO"] the result has
+    one row per year, per year and department, and so on down to districts,
+    with the measures summed and "ROWS" counting the source rows. "LEVEL" names
+    the deepest level of each row; deeper level columns are null. Charts filter
+    this small table instead of grouping the full dataset again.
+
+    The rollup is written next to the dataset's Parquet file and recorded in
+    the manifest, so it is built once per dataset version (CSV contents and
+    declared schema) and per levels/measures.
+
+    Args:
+        csv_path: CSV file returned by download().
+        data_dir: Directory holding the files and the manifest.
+        levels: Grouping columns, from coarsest to finest.
+        measures: Numeric columns to sum.
+        force: If True, rebuild even if an up-to-date rollup exists.
+
+    Returns:
+        The rollup table.
+    """
+    with Manifest(data_dir) as manifest:
+        parquet_path = _ingest_csv(csv_path, manifest, force)
+        converted = manifest.get(csv_path.name)["parquet"]
+        key = {
+            "version": f"{converted['source_sha256']}:{converted['schema']}",
+            "levels": levels,
+            "measures": measures,
+        }
+        rollup_path = parquet_path.with_suffix(".rollup.parquet")
+        cached = manifest.get(csv_path.name).get("rollup") or {}
+
+        if not force and cached.get("key") == key and rollup_path.is_file():
+            logging.info(f"Rollup cache hit: {rollup_path.name}")
+            return pl.read_parquet(rollup_path)
+
+        start = time.perf_counter()
+        df = _rollup_frame(pl.scan_parquet(parquet_path), levels, measures).collect()
+        part_path = partial_path(rollup_path)
+        df.write_parquet(part_path, compression=PARQUET_COMPRESSION)
+        part_path.replace(rollup_path)
+        logging.info(
+            f"Built rollup {rollup_path.name}: {df.height:,} rows "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+        manifest.update(
+            csv_path.name, {"rollup": {"file": rollup_path.name, "key": key}}
+        )
+    return df
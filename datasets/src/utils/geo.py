@@ -0,0 +1,293 @@
+import hashlib
+import logging
+import time
+
+from functools import lru_cache
+from pathlib import Path
+from typing import Optional, Union
+
+import geopandas as gpd
+import numpy as np
+import polars as pl
+import shapely
+
+from utils.datasets import (
+    PARQUET_COMPRESSION,
+    Manifest,
+    file_sha256,
+    format_bytes,
+    partial_path,
+)
+
+
+GEO_CACHE_DIR = "cache"
+# Bump when the way layers are converted changes, to invalidate older copies.
+GEO_CACHE_VERSION = 1
+SHAPEFILE_PARTS = (".shp", ".shx", ".dbf", ".prj", ".cpg")
+LOCATION_KEYS = ["DEPARTAMENTO", "PROVINCIA", "DISTRITO"]
+
+
+def _source_files(path: Path) -> list[Path]:
+    """Return every file a layer is read from (all parts of a shapefile)."""
+    if path.suffix.lower() != ".shp":
+        return [path]
+    return [p for p in map(path.with_suffix, SHAPEFILE_PARTS) if p.is_file()]
+
+
+def _source_stats(files: list[Path]) -> dict[str, list[int]]:
+    return {f.name: [f.stat().st_mtime_ns, f.stat().st_size] for f in files}
+
+
+def _source_sha256(files: list[Path]) -> str:
+    digest = hashlib.sha256()
+    for f in files:
+        digest.update(f"{f.name}:{file_sha256(f)}".encode())
+    return digest.hexdigest()
+
+
+def _cache_is_current(
+    record: Optional[dict], files: list[Path], manifest: Manifest, name: str
+) -> bool:
+    """
+    Check a cached conversion against its sources.
+
+    Unchanged modification times and sizes are trusted without reading the
+    sources. Otherwise the sources are hashed, and if the content is the same
+    (e.g. after a fresh checkout) the new stats are recorded.
+    """
+    if not record or record.get("version") != GEO_CACHE_VERSION:
+        return False
+    stats = _source_stats(files)
+    if record.get("stats") == stats:
+        return True
+    if record.get("sha256") != _source_sha256(files):
+        return False
+    manifest.update(name, {"stats": stats})
+    return True
+
+
+def cached_layer(path: Union[str, Path], cache_dir: Optional[Path] = None) -> Path:
+    """
+    Return a GeoParquet copy of a shapefile or GeoJSON layer, converting it once.
+
+    Conversions are stored in cache_dir (by default a "cache" directory next to
+    the source) and recorded in its manifest with the source files' modification
+    times, sizes and SHA-256, so they are only redone when a source changes.
+    Column names are stored without surrounding whitespace.
+    """
+    path = Path(path)
+    cache_dir = cache_dir or path.parent / GEO_CACHE_DIR
+    cache_path = cache_dir / f"{path.name}.parquet"
+    files = _source_files(path)
+
+    with Manifest(cache_dir) as manifest:
+        record = manifest.get(cache_path.name)
+        if cache_path.is_file() and _cache_is_current(
+            record, files, manifest, cache_path.name
+        ):
+            logging.info(f"GeoParquet cache hit: {cache_path.name}")
+            return cache_path
+
+        start = time.perf_counter()
+        gdf = gpd.read_file(path)
+        # Some layers pad their column names (e.g. " T_TOTAL").
+        gdf.columns = gdf.columns.str.strip()
+        cache_dir.mkdir(parents=True, exist_ok=True)
+        part_path = partial_path(cache_path)
+        gdf.to_parquet(
+            part_path, compression=PARQUET_COMPRESSION, write_covering_bbox=True
+        )
+        part_path.replace(cache_path)
+        logging.info(
+            f"Converted {path.name} to GeoParquet: {len(gdf):,} rows, "
+            f"{format_bytes(sum(f.stat().st_size for f in files))} -> "
+            f"{format_bytes(cache_path.stat().st_size)} "
+            f"in {time.perf_counter() - start:.2f}s"
+        )
+
+        manifest.update(
+            cache_path.name,
+            {
+                "source": path.name,
+                "version": GEO_CACHE_VERSION,
+                "stats": _source_stats(files),
+                "sha256": _source_sha256(files),
+                "rows": len(gdf),
+            },
+        )
+    return cache_path
+
+
+def read_layer(
+    path: Union[str, Path],
+    columns: Optional[list[str]] = None,
+    bbox: Optional[tuple[float, float, float, float]] = None,
+    cache_dir: Optional[Path] = None,
+) -> gpd.GeoDataFrame:
+    """
+    Read a shapefile or GeoJSON layer through its GeoParquet cache.
+
+    Layers given as a URL (e.g. "https://..." under WASM) have no local copy
+    to cache next to and are read directly.
+
+    Args:
+        path: Source layer (.shp, .geojson, ...) or its URL.
+        columns: Attribute columns to read; the geometry is always included.
+            All columns are read if None.
+        bbox: Only read features intersecting (minx, miny, maxx, maxy).
+        cache_dir: Where to keep the GeoParquet copy (see cached_layer()).
+
+    Returns:
+        The layer, with rows in the same order as the source.
+    """
+    if columns is not None:
+        columns = [*columns, "geometry"]
+    if isinstance(path, str) and "://" in path:
+        gdf = gpd.read_file(path, bbox=bbox)
+        gdf.columns = gdf.columns.str.strip()
+        return gdf if columns is None else gdf[columns]
+    cache_path = cached_layer(path, cache_dir)
+    return gpd.read_parquet(cache_path, columns=columns, bbox=bbox)
+
+
+class DistrictIndex:
+    """
+    Vectorized point-in-polygon lookups of district UBIGEO codes.
+
+    Wraps an STRtree over the distrital layer. Points are matched against all
+    districts in one call; a point on a shared border gets the first district
+    in layer order, and points outside every district get null. Codes are
+    Int32, like the UBIGEO column of ubigeo_table() and with_ubigeo().
+    """
+
+    def __init__(self, ubigeo: np.ndarray, geometries: np.ndarray, crs) -> None:
+        self.ubigeo = np.asarray(ubigeo).astype(np.int32)
+        self.crs = crs
+        self._tree = shapely.STRtree(geometries)
+
+    @classmethod
+    def from_layer(
+        cls, path: Union[str, Path], id_column: str = "IDDIST"
+    ) -> "DistrictIndex":
+        """Build the index from a district layer, read through its GeoParquet cache."""
+        gdf = read_layer(path, columns=[id_column])
+        return cls(gdf[id_column].to_numpy(), gdf.geometry.to_numpy(), gdf.crs)
+
+    def lookup_geometries(self, points: np.ndarray) -> pl.Series:
+        """Return the UBIGEO of the district containing each point geometry."""
+        point_idx, district_idx = self._tree.query(points, predicate="intersects")
+        # query() groups matches by point but lists each point's districts in
+        # tree order; sort them by layer order and keep the first.
+        order = np.lexsort((district_idx, point_idx))
+        point_idx, district_idx = point_idx[order], district_idx[order]
+        first_points, first = np.unique(point_idx, return_index=True)
+        codes = np.zeros(len(points), dtype=np.int32)
+        codes[first_points] = self.ubigeo[district_idx[first]]
+        found = np.zeros(len(points), dtype=bool)
+        found[first_points] = True
+        return pl.Series("UBIGEO", codes).scatter(np.flatnonzero(~found), None)
+
+    def lookup(self, lon: np.typing.ArrayLike, lat: np.typing.ArrayLike) -> pl.Series:
+        """Return the UBIGEO for each (lon, lat) pair, in the layer's CRS."""
+        return self.lookup_geometries(shapely.points(lon, lat))
+
+    def lookup_points(self, points: gpd.GeoSeries) -> pl.Series:
+        """Return the UBIGEO for each point, reprojecting to the layer's CRS."""
+        if points.crs is not None and self.crs is not None:
+            points = points.to_crs(self.crs)
+        return self.lookup_geometries(points.to_numpy())
+
+
+@lru_cache
+def district_index(path: Union[str, Path]) -> DistrictIndex:
+    """
+    Return the DistrictIndex for a district layer, built once per process.
+
+    The layer's geometries and codes persist between runs in its GeoParquet
+    cache. Building the STRtree from them is faster than unpickling a saved
+    tree, so only the layer is stored.
+    """
+    return DistrictIndex.from_layer(path)
+
+
+def normalize_place_name(expr: pl.Expr) -> pl.Expr:
+    """Upper case without accents, punctuation or repeated spaces ("Ocoña" -> "OCONA")."""
+    return (
+        expr.str.normalize("NFKD")
+        .str.replace_all(r"\p{Mn}", "")
+        .str.to_uppercase()
+        .str.replace_all(r"[^A-Z0-9]+", " ")
+        .str.strip_chars()
+    )
+
+
+def ubigeo_table(path: Union[str, Path], cache_dir: Optional[Path] = None) -> Path:
+    """
+    Return a Parquet lookup table from normalized place names to UBIGEO codes.
+
+    The table is built from a district layer (IDDIST, NOMBDEP, NOMBPROV,
+    NOMBDIST) and stored next to its GeoParquet cache. It is rebuilt whenever
+    that cache is.
+    """
+    layer_path = cached_layer(path, cache_dir)
+    table_path = layer_path.with_name(f"{Path(path).name}.ubigeo.parquet")
+    if (
+        table_path.is_file()
+        and table_path.stat().st_mtime_ns >= layer_path.stat().st_mtime_ns
+    ):
+        return table_path
+
+    layer = pl.scan_parquet(layer_path)
+    table = (
+        layer.select(
+            normalize_place_name(pl.col("NOMBDEP")).alias("DEPARTAMENTO"),
+            normalize_place_name(pl.col("NOMBPROV")).alias("PROVINCIA"),
+            normalize_place_name(pl.col("NOMBDIST")).alias("DISTRITO"),
+            pl.col("IDDIST").cast(pl.Int32).alias("UBIGEO"),
+        )
+        .unique(LOCATION_KEYS, keep="first", maintain_order=True)
+        .collect()
+    )
+    part_path = partial_path(table_path)
+    table.write_parquet(part_path, compression=PARQUET_COMPRESSION)
+    part_path.replace(table_path)
+    logging.info(f"Built UBIGEO lookup table: {table.height:,} districts")
+    return table_path
+
+
+def with_ubigeo(
+    df: Union[pl.DataFrame, pl.LazyFrame], table_path: Path
+) -> Union[pl.DataFrame, pl.LazyFrame]:
+    """
+    Add an integer "UBIGEO" column resolved from DEPARTAMENTO/PROVINCIA/DISTRITO.
+
+    A UBIGEO already present in the data takes precedence; the names are only
+    used for rows without one. Rows whose names do not match any district get
+    a null UBIGEO. Group and join on the result instead of the name triple.
+
+    Args:
+        df: Data with the three location columns.
+        table_path: Lookup table returned by ubigeo_table().
+    """
+    lazy = df.lazy()
+    table = pl.scan_parquet(table_path).rename({"UBIGEO": "_UBIGEO"})
+    key_names = [f"_{key}" for key in LOCATION_KEYS]
+    resolved = (
+        lazy.with_columns(
+            normalize_place_name(pl.col(key)).alias(name)
+            for key, name in zip(LOCATION_KEYS, key_names)
+        )
+        .join(
+            table.rename(dict(zip(LOCATION_KEYS, key_names))),
+            on=key_names,
+            how="left",
+            maintain_order="left",
+        )
+        .drop(key_names)
+    )
+
+    ubigeo = pl.col("_UBIGEO")
+    if "UBIGEO" in lazy.collect_schema().names():
+        ubigeo = pl.coalesce(pl.col("UBIGEO").cast(pl.Int32, strict=False), ubigeo)
+    resolved = resolved.with_columns(ubigeo.alias("UBIGEO")).drop("_UBIGEO")
+    return resolved if isinstance(df, pl.LazyFrame) else resolved.collect()
@@ -0,0 +1,320 @@
+"""
+Download tests against benchmarks.server, a local stand-in for the portal.
+
+Run from the datasets directory:
+
+    uv run python -m unittest discover tests
+"""
+
+import logging
+import os
+import socket
+import sys
+import tempfile
+import threading
+import time
+import unittest
+
+from collections.abc import Iterator
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+import requests
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from benchmarks.server import ArchiveAdapter, StandInServer
+from utils.datasets import (
+    DEFAULT_TIMEOUT,
+    MIN_TIMEOUT,
+    EventLog,
+    HostHealth,
+    HostLimiter,
+    Manifest,
+    create_session,
+    download,
+    download_csvs,
+    fetch_response_with_fallbacks,
+)
+
+
+CSV_PATH = "/0/sites/default/files/generacion_anual_0_0.csv"
+
+
+def temp_dir(test: unittest.TestCase) -> Path:
+    """Return a temporary directory, deleted when the test ends."""
+    tmp = tempfile.TemporaryDirectory()
+    test.addCleanup(tmp.cleanup)
+    return Path(tmp.name)
+
+
+class ResumeTest(unittest.TestCase):
+    """A partial file left by an earlier run is only resumed if unchanged."""
+
+    def setUp(self) -> None:
+        logging.disable(logging.WARNING)
+        self.server = StandInServer(n_pages=1, n_files=1, rows=2_000).__enter__()
+        self.url = f"{self.server.url}{CSV_PATH}"
+        self.body = self.server.body(CSV_PATH)[0]
+        self.etag = requests.get(self.url, timeout=10).headers["ETag"]
+        self.data_dir = temp_dir(self)
+        self.target = self.data_dir / Path(CSV_PATH).name
+
+    def tearDown(self) -> None:
+        self.server.__exit__(None, None, None)
+        logging.disable(logging.NOTSET)
+
+    def leave_partial(self, content: bytes, validator: str = "") -> None:
+        self.data_dir.mkdir(parents=True, exist_ok=True)
+        self.target.with_name(f"{self.target.name}.part").write_bytes(content)
+        if validator:
+            self.target.with_name(f"{self.target.name}.part.validator").write_text(
+                validator
+            )
+
+    def download(self) -> bytes:
+        paths = download(self.url, self.data_dir, session=create_session())
+        self.assertEqual(paths, [self.target])
+        return self.target.read_bytes()
+
+    def test_partial_without_validator_is_discarded(self) -> None:
+        self.leave_partial(b"X" * 1000)
+        self.assertEqual(self.download(), self.body)
+
+    def test_partial_of_another_version_is_replaced(self) -> None:
+        self.leave_partial(b"X" * 1000, validator='"older-version"')
+        self.assertEqual(self.download(), self.body)
+
+    def test_partial_of_same_version_is_resumed(self) -> None:
+        half = len(self.body) // 2
+        self.leave_partial(self.body[:half], validator=self.etag)
+        self.assertEqual(self.download(), self.body)
+        self.assertFalse(
+            self.target.with_name(f"{self.target.name}.part.validator").exists()
+        )
+
+
+class CountingLimiter(HostLimiter):
+    """A HostLimiter that counts the slots taken."""
+
+    def __init__(self, max_per_host: int) -> None:
+        super().__init__(max_per_host)
+        self.taken = 0
+
+    @contextmanager
+    def slot(self, url: str) -> Iterator[None]:
+        with super().slot(url):
+            self.taken += 1
+            yield
+
+
+class HostSlotTest(unittest.TestCase):
+    def test_one_slot_covers_request_and_body(self) -> None:
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        with StandInServer(n_pages=1, n_files=4, rows=2_000) as server:
+            urls = [
+                f"{server.url}/0/sites/default/files/generacion_anual_0_{i}.csv"
+                for i in range(4)
+            ]
+            limiter = CountingLimiter(max_per_host=1)
+            with ThreadPoolExecutor(4) as executor:
+                paths = download_csvs(
+                    urls,
+                    temp_dir(self),
+                    executor=executor,
+                    limiter=limiter,
+                    session=create_session(),
+                )
+        self.assertEqual(len(paths), 4)
+        self.assertEqual(limiter.taken, 4)
+
+
+class TimeoutSession(requests.Session):
+    """A session that remembers the timeout of each request."""
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.timeouts: list[float] = []
+
+    def get(self, url, **kwargs) -> requests.Response:
+        self.timeouts.append(kwargs.get("timeout"))
+        return super().get(url, **kwargs)
+
+
+class HostHealthTest(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.disable(logging.WARNING)
+        self.server = StandInServer(n_pages=1, n_files=1, rows=100).__enter__()
+        self.url = f"{self.server.url}{CSV_PATH}"
+
+    def tearDown(self) -> None:
+        self.server.__exit__(None, None, None)
+        logging.disable(logging.NOTSET)
+
+    def test_latency_excludes_waiting_for_a_slot(self) -> None:
+        limiter, health = HostLimiter(max_per_host=1), HostHealth()
+        busy, release = threading.Event(), threading.Event()
+
+        def hold_slot() -> None:
+            with limiter.slot(self.url):
+                busy.set()
+                release.wait()
+
+        threading.Thread(target=hold_slot).start()
+        busy.wait()
+        threading.Timer(1.5, release.set).start()
+        fetch_response_with_fallbacks(self.url, limiter=limiter, health=health)
+        self.assertEqual(health.timeout(self.url), MIN_TIMEOUT)
+
+    def test_one_request_probes_a_host_after_the_cooldown(self) -> None:
+        health = HostHealth(failure_threshold=1, cooldown=0)
+        health.record_failure(self.url)
+        self.assertFalse(health.is_open(self.url))
+        self.assertTrue(health.is_open(self.url))
+        health.record_failure(self.url)
+        self.assertFalse(health.is_open(self.url))
+        health.record_success(self.url, 0.01)
+        self.assertFalse(health.is_open(self.url))
+        self.assertFalse(health.is_open(self.url))
+
+    def test_archive_urls_keep_the_default_timeout(self) -> None:
+        archive_url = f"https://web.archive.org/web/0/{self.url}"
+        health = HostHealth()
+        health.record_success(archive_url, 0.01)
+        session = TimeoutSession()
+        session.mount("https://web.archive.org", ArchiveAdapter(self.server.url))
+        response = fetch_response_with_fallbacks(
+            archive_url, session=session, health=health
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(session.timeouts, [DEFAULT_TIMEOUT])
+
+
+class SessionTest(unittest.TestCase):
+    def test_unreachable_host_is_not_retried(self) -> None:
+        # A port nothing listens on, so every connection is refused.
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            url = f"http://127.0.0.1:{sock.getsockname()[1]}/a.csv"
+        start = time.perf_counter()
+        with self.assertRaises(requests.ConnectionError):
+            create_session().get(url, timeout=5)
+        self.assertLess(time.perf_counter() - start, 0.5)
+
+
+class EventLogTest(unittest.TestCase):
+    def test_revalidated_files_count_as_hits(self) -> None:
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        data_dir = temp_dir(self)
+        with StandInServer(n_pages=1, n_files=2, rows=100) as server:
+            download(server.page_urls, data_dir, session=create_session())
+            events = EventLog()
+            download(
+                server.page_urls,
+                data_dir,
+                revalidate=True,
+                page_max_age=0,
+                session=create_session(),
+                events=events,
+            )
+        cache = events.summary()["cache"]
+        self.assertEqual(cache["not_modified"], 3)
+        self.assertEqual(cache["hit_rate"], 1.0)
+
+    def test_transfers_are_charged_to_the_host_that_served_them(self) -> None:
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        with StandInServer(n_pages=1, n_files=2, rows=100, failure_rate=1) as server:
+            session = create_session(max_retries=0)
+            session.mount("https://web.archive.org", ArchiveAdapter(server.url))
+            events = EventLog()
+            paths = download(
+                server.page_urls,
+                temp_dir(self),
+                session=session,
+                events=events,
+            )
+            primary = server.url.split("://", 1)[1]
+        hosts = events.summary()["hosts"]
+        self.assertEqual(len(paths), 2)
+        self.assertNotIn(primary, hosts)
+        self.assertGreater(hosts["web.archive.org"]["bytes"], 0)
+
+
+class SameContentServer(StandInServer):
+    """A StandInServer that serves the same CSV at every ".csv" path."""
+
+    def body(self, path: str) -> Optional[tuple[bytes, str]]:
+        return super().body(CSV_PATH if path.endswith(".csv") else path)
+
+
+class BlobStoreTest(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        self.server = SameContentServer(n_pages=1, n_files=1, rows=500)
+        self.server.__enter__()
+        self.addCleanup(self.server.__exit__, None, None, None)
+        self.urls = [f"{self.server.url}/{name}.csv" for name in ("a", "b")]
+        self.data_dir = temp_dir(self)
+
+    def download(self, url: str, **kwargs) -> Path:
+        paths = download(url, self.data_dir, session=create_session(), **kwargs)
+        self.assertEqual(len(paths), 1)
+        return paths[0]
+
+    def blobs(self) -> list[Path]:
+        return sorted(p for p in (self.data_dir / "blobs").rglob("*") if p.is_file())
+
+    def test_identical_content_is_stored_once(self) -> None:
+        a, b = (self.download(url) for url in self.urls)
+        self.assertTrue(os.path.samefile(a, b))
+        self.assertEqual(len(self.blobs()), 1)
+        self.assertTrue(os.path.samefile(a, self.blobs()[0]))
+
+    def test_blob_is_released_with_its_last_alias(self) -> None:
+        for url in self.urls:
+            self.download(url)
+        [old_blob] = self.blobs()
+
+        # New content on the server: each alias moves to the new blob, and the
+        # old one is deleted only once neither refers to it.
+        self.server.rows = 600
+        a = self.download(self.urls[0], revalidate=True)
+        self.assertEqual(len(self.blobs()), 2)
+        self.assertTrue(old_blob.is_file())
+        b = self.download(self.urls[1], revalidate=True)
+        self.assertFalse(old_blob.is_file())
+        self.assertTrue(os.path.samefile(a, b))
+        self.assertEqual(len(self.blobs()), 1)
+
+    def test_deleted_alias_is_restored_from_its_blob(self) -> None:
+        path = self.download(self.urls[0])
+        content = path.read_bytes()
+        path.unlink()
+        self.server.reset_counters()
+        self.assertEqual(self.download(self.urls[0]), path)
+        self.assertEqual(path.read_bytes(), content)
+        self.assertEqual(self.server.requests, 0)
+
+
+class ManifestTest(unittest.TestCase):
+    def test_archive_copy_is_found_before_flush(self) -> None:
+        data_dir = temp_dir(self)
+        (data_dir / "a.csv").write_text("x")
+        primary = "https://datosabiertos.gob.pe/sites/default/files/a.csv"
+        archive = f"https://web.archive.org/web/20250629054102/{primary}"
+
+        manifest = Manifest(data_dir, checkpoint_interval=float("inf"))
+        manifest.record(archive, "a", "a.csv")
+        self.assertEqual(manifest.find(archive)[0], data_dir / "a.csv")
+        self.assertEqual(manifest.find(primary)[0], data_dir / "a.csv")
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,38 @@
+"""
+Tests of the geographic helpers in utils.geo.
+
+Run from the datasets directory:
+
+    uv run python -m unittest discover tests
+"""
+
+import sys
+import unittest
+
+from pathlib import Path
+
+import numpy as np
+import shapely
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from utils.geo import DistrictIndex
+
+
+class DistrictIndexTest(unittest.TestCase):
+    def test_shared_points_get_the_first_district_in_layer_order(self) -> None:
+        # Districts overlapping the origin, listed in an order the STRtree
+        # does not keep, and one district elsewhere.
+        squares = [shapely.box(-i, -i, i, i) for i in range(1, 60)]
+        geometries = np.array([*squares[::-1], shapely.box(100, 100, 101, 101)])
+        ubigeo = np.arange(len(geometries)) + 10101
+        index = DistrictIndex(ubigeo, geometries, crs=None)
+
+        codes = index.lookup([0.0, 100.5, 50.0], [0.0, 100.5, -200.0])
+        self.assertEqual(codes.to_list(), [10101, int(ubigeo[-1]), None])
+        self.assertEqual(str(codes.dtype), "Int32")
+
+
+if __name__ == "__main__":
+    unittest.main()
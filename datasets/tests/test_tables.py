@@ -0,0 +1,84 @@
+"""
+Tests of the Parquet conversion (ingest) and rollup caches.
+
+Run from the datasets directory:
+
+    uv run python -m unittest discover tests
+"""
+
+import dataclasses
+import logging
+import sys
+import tempfile
+import unittest
+
+from pathlib import Path
+
+import polars as pl
+
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1] / "src"))
+
+from benchmarks.fixtures import generation_csv
+from utils.datasets import DATASETS, ingest, rollup
+
+
+class TablesTest(unittest.TestCase):
+    def setUp(self) -> None:
+        logging.disable(logging.WARNING)
+        self.addCleanup(logging.disable, logging.NOTSET)
+        tmp = tempfile.TemporaryDirectory()
+        self.addCleanup(tmp.cleanup)
+        self.data_dir = Path(tmp.name)
+        self.csv_path = self.data_dir / "generacion_anual_2023.csv"
+        self.csv_path.write_bytes(generation_csv(3_000))
+
+    def test_ingest_is_redone_when_the_declared_schema_changes(self) -> None:
+        [parquet_path] = ingest(self.csv_path, self.data_dir)
+        self.assertEqual(pl.read_parquet_schema(parquet_path)["ANIO"], pl.Int64)
+        mtime = parquet_path.stat().st_mtime_ns
+        ingest(self.csv_path, self.data_dir)
+        self.assertEqual(parquet_path.stat().st_mtime_ns, mtime)
+
+        spec = DATASETS["generacion_residuos"]
+        self.addCleanup(DATASETS.__setitem__, spec.name, spec)
+        DATASETS[spec.name] = dataclasses.replace(
+            spec, columns={**spec.columns, "ANIO": pl.String}
+        )
+        ingest(self.csv_path, self.data_dir)
+        self.assertEqual(pl.read_parquet_schema(parquet_path)["ANIO"], pl.String)
+
+    def test_rollup_totals_every_level(self) -> None:
+        levels = ["ANIO", "DEPARTAMENTO", "PROVINCIA"]
+        measures = ["GENERACION_MUN_TANIO"]
+        df = rollup(self.csv_path, self.data_dir, levels, measures)
+
+        self.assertEqual(df["LEVEL"].unique().sort().to_list(), sorted(levels))
+        for level in levels:
+            rows = df.filter(pl.col("LEVEL") == level)
+            self.assertEqual(rows["ROWS"].sum(), 3_000)
+            self.assertAlmostEqual(
+                rows["GENERACION_MUN_TANIO"].sum(),
+                df.filter(pl.col("LEVEL") == "ANIO")["GENERACION_MUN_TANIO"].sum(),
+                delta=0.01,
+            )
+        departments = df.filter(pl.col("LEVEL") == "DEPARTAMENTO")
+        self.assertEqual(departments["PROVINCIA"].null_count(), departments.height)
+
+    def test_rollup_cache_is_keyed_by_levels_and_measures(self) -> None:
+        measures = ["GENERACION_MUN_TANIO"]
+        rollup(self.csv_path, self.data_dir, ["ANIO"], measures)
+        rollup_path = self.data_dir / "generacion_anual_2023.rollup.parquet"
+        mtime = rollup_path.stat().st_mtime_ns
+
+        rollup(self.csv_path, self.data_dir, ["ANIO"], measures)
+        self.assertEqual(rollup_path.stat().st_mtime_ns, mtime)
+
+        df = rollup(self.csv_path, self.data_dir, ["ANIO", "DEPARTAMENTO"], measures)
+        self.assertEqual(set(df["LEVEL"]), {"ANIO", "DEPARTAMENTO"})
+        df = rollup(self.csv_path, self.data_dir, ["ANIO"], ["POB_TOTAL_INEI"])
+        self.assertEqual(df.columns, ["LEVEL", "ANIO", "POB_TOTAL_INEI", "ROWS"])
+
+
+if __name__ == "__main__":
+    unittest.main()